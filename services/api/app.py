@@ -1,14 +1,22 @@
-import hashlib, json, os, time
+import asyncio, json, os, time
 import logging
+from functools import lru_cache
 from dataclasses import asdict, dataclass
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
+import orjson
 import pandas as pd
-from fastapi import FastAPI, HTTPException
+import xxhash
+import pyarrow as pa
+from numba import njit, prange
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from google.cloud import bigquery
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, PositiveInt
+from google.cloud import bigquery, bigquery_storage
 
 PROJECT = os.environ.get("ALPHAGINI_PROJECT")
 DATASET_MD = os.environ.get("ALPHAGINI_BQ_DATASET", "alphagini_marketdata")
@@ -17,6 +25,10 @@ TABLE_OHLCV = f"{PROJECT}.{DATASET_MD}.ohlcv"
 DATASET_EXP = os.environ.get("ALPHAGINI_EXP_DATASET", "alphagini_experiments")
 TABLE_BT = f"{PROJECT}.{DATASET_EXP}.backtests"
 
+# backtest rows are buffered and appended with one load job per batch window; BigQuery allows
+# 1,500 load jobs per table per day (one per ~58 s), so the window never drops below 60 s
+PERSIST_MAX_AGE_S = max(60.0, float(os.environ.get("ALPHAGINI_PERSIST_MAX_AGE_S", "60")))
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("alphagini.api")
 
@@ -27,6 +39,8 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], allow_methods=["*"], allow_headers=["*"],
 )
+# equity series are long runs of similar floats; compress anything non-trivial
+app.add_middleware(GZipMiddleware, minimum_size=4096, compresslevel=4)
 
 # ---------- Models ----------
 class BacktestRequest(BaseModel):
@@ -41,6 +55,25 @@ class BacktestRequest(BaseModel):
     sma_fast: int = 10
     sma_slow: int = 30
 
+class SweepRequest(BaseModel):
+    symbol: str
+    timeframe: str = Field(pattern=r"^\d+[smhdw]|[smhdw]$", default="5m")
+    start: str
+    end: str
+    cash_start: float = 100_000.0
+    # every (fast, slow) pair in the cartesian product is evaluated
+    sma_fasts: List[PositiveInt] = Field(min_length=1, max_length=200)
+    sma_slows: List[PositiveInt] = Field(min_length=1, max_length=200)
+
+@dataclass
+class OHLCV:
+    # columnar bars, sorted by ts; only re-wrapped in pandas at the response boundary
+    ts: np.ndarray      # int64 ns since epoch (UTC)
+    close: np.ndarray   # float32: ~7 significant digits is plenty for bar prices
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
 @dataclass
 class EquityMetrics:
     sharpe: float
@@ -50,9 +83,25 @@ class EquityMetrics:
     rel_return: float
 
 # ---------- Utils ----------
-def bq() -> bigquery.Client:
-    return bigquery.Client(project=PROJECT)
+_BQ: Optional[bigquery.Client] = None
 
+def bq() -> bigquery.Client:
+    # one client (credentials + pooled HTTP session) per worker process
+    global _BQ
+    if _BQ is None:
+        _BQ = bigquery.Client(project=PROJECT)
+    return _BQ
+
+_BQS: Optional[bigquery_storage.BigQueryReadClient] = None
+
+def bqs() -> bigquery_storage.BigQueryReadClient:
+    # one Storage Read API client per process; result sets stream as Arrow
+    global _BQS
+    if _BQS is None:
+        _BQS = bigquery_storage.BigQueryReadClient()
+    return _BQS
+
+@lru_cache(maxsize=32)
 def periods_per_year(tf: str) -> int:
     # approximate for intraday
     mult = int(tf[:-1]) if tf[:-1].isdigit() else 1
@@ -63,13 +112,23 @@ def periods_per_year(tf: str) -> int:
     if unit == "w": return int(52/mult)
     return 365
 
-def load_ohlcv(symbol: str, timeframe: str, start: str, end: str) -> pd.DataFrame:
+def sma(arr: np.ndarray, w: int) -> np.ndarray:
+    # equivalent to rolling(w, min_periods=1).mean(), from a single cumsum pass
+    cs = np.concatenate(([0.0], np.cumsum(arr, dtype=np.float64)))  # accumulate in f64
+    out = np.empty(len(arr))
+    k = min(w, len(arr))
+    out[:k] = cs[1:k+1] / np.arange(1, k+1)
+    out[w:] = (cs[w+1:] - cs[1:-w]) / w
+    return out
+
+def load_ohlcv(symbol: str, timeframe: str, start: str, end: str) -> OHLCV:
     client = bq()
     q = f"""
-      SELECT ts, open, high, low, close, volume
+      SELECT ts, close
       FROM `{TABLE_OHLCV}`
       WHERE symbol=@s AND timeframe=@tf
         AND ts BETWEEN @start AND @end
+        AND DATE(ts) BETWEEN DATE(@start) AND DATE(@end)  -- partition pruning
       ORDER BY ts
     """
     job = client.query(
@@ -83,66 +142,145 @@ def load_ohlcv(symbol: str, timeframe: str, start: str, end: str) -> pd.DataFram
             ]
         ),
     )
-    df = job.result().to_dataframe(create_bqstorage_client=False)
-    if df.empty:
+    return _bars_from_arrow(job.result().to_arrow(bqstorage_client=bqs()))
+
+def _bars_from_arrow(tbl: pa.Table) -> OHLCV:
+    if tbl.num_rows == 0:
         raise HTTPException(status_code=404, detail="No data for given window")
-    df["ts"] = pd.to_datetime(df["ts"], utc=True)
-    df = df.set_index("ts").sort_index()
-    return df
+    ts = tbl["ts"].cast(pa.timestamp("ns", tz="UTC")).cast(pa.int64()).to_numpy()
+    close = tbl["close"].to_numpy().astype(np.float32)
+    if len(ts) > 1 and (np.diff(ts) < 0).any():
+        order = np.argsort(ts, kind="stable")
+        ts, close = ts[order], close[order]
+    return OHLCV(ts=ts, close=close)
 
 # ---------- Models (predictions) ----------
-def model_predict(df: pd.DataFrame, model: str, sma_fast=10, sma_slow=30) -> pd.Series:
-    y = df["close"].astype(float)
+def model_predict(close: np.ndarray, model: str, sma_fast=10, sma_slow=30) -> np.ndarray:
+    y = np.asarray(close)
     if model == "naive":
-        return y.shift(1).fillna(y.iloc[0])
+        return np.concatenate((y[:1], y[:-1]))
     if model == "sma":
-        return y.rolling(sma_fast, min_periods=1).mean()
+        return sma(y, sma_fast)
     raise ValueError("unknown model")
 
 # ---------- Strategies ----------
-def equity_buy_hold(df: pd.DataFrame, cash_start: float) -> pd.Series:
-    price = df["close"].astype(float)
-    units = cash_start / price.iloc[0]
-    return units * price
-
-def equity_sma_cross(df: pd.DataFrame, cash_start: float, sma_fast=10, sma_slow=30) -> pd.Series:
-    price = df["close"].astype(float)
-
-    fast = price.rolling(sma_fast, min_periods=1).mean()
-    slow = price.rolling(sma_slow, min_periods=1).mean()
-    long = (fast > slow).astype(int)
-    long = long.shift(1).fillna(0)  # act on next bar
-
-    equity: list[float] = [cash_start]
-    units = 0.0
-    cash = cash_start
-
-    # one equity value per bar after the first
-    for p, pos in zip(price.iloc[1:].values, long.iloc[1:].values):
-        if pos and units == 0.0:      # enter long
-            units = cash / p
-            cash = 0.0
-        elif (not pos) and units > 0: # exit long
-            cash = units * p
-            units = 0.0
-
-        equity.append(cash + units * p)
-
-    # equity has exactly len(price) values now
-    return pd.Series(equity, index=price.index)
+def equity_buy_hold(price: np.ndarray, cash_start: float) -> np.ndarray:
+    price = np.asarray(price)
+    units = cash_start / float(price[0])
+    return np.multiply(price, units, dtype=np.float64)  # equity stays f64 even for f32 prices
+
+@njit(cache=True, fastmath=True, nogil=True)  # nogil: concurrent requests run in parallel threads
+def _sma_cross_equity(price: np.ndarray, fast_w: int, slow_w: int, cash: float) -> np.ndarray:
+    # single pass: running-sum SMAs (min_periods=1), signal, next-bar fill, equity.
+    # price may be f32 or f64; sums and equity are always accumulated in f64
+    n = len(price)
+    equity = np.empty(n)
+    sum_fast = 0.0
+    sum_slow = 0.0
+    held = False      # position over the current bar (signal from two bars back)
+    pending = False   # signal from the previous bar, acted on this bar
+    eq = cash
+    for i in range(n):
+        p = np.float64(price[i])
+        sum_fast += p
+        sum_slow += p
+        if i >= fast_w:
+            sum_fast -= price[i - fast_w]
+        if i >= slow_w:
+            sum_slow -= price[i - slow_w]
+        fast = sum_fast / min(i + 1, fast_w)
+        slow = sum_slow / min(i + 1, slow_w)
+
+        if held:
+            eq *= p / np.float64(price[i - 1])
+        equity[i] = eq
+
+        held = pending
+        pending = fast > slow
+    return equity
+
+def equity_sma_cross(price: np.ndarray, cash_start: float, sma_fast=10, sma_slow=30) -> np.ndarray:
+    price = np.asarray(price)
+    if price.dtype not in (np.float32, np.float64):
+        price = price.astype(np.float64)
+    return _sma_cross_equity(price, int(sma_fast), int(sma_slow), float(cash_start))
+
+SWEEP_COLUMNS = ("sharpe", "win_rate", "max_drawdown", "abs_return_usd", "rel_return")
+
+@njit(cache=True, parallel=True, nogil=True)
+def _sma_cross_sweep(price: np.ndarray, fasts: np.ndarray, slows: np.ndarray, cash: float, ppyr: int) -> np.ndarray:
+    # out[j, k] = SWEEP_COLUMNS[j] for pair (fasts[k // len(slows)], slows[k % len(slows)]);
+    # same semantics as _sma_cross_equity + metrics_from_equity, without storing curves
+    n = len(price)
+    cs = np.empty(n + 1)  # shared by every window
+    cs[0] = 0.0
+    for i in range(n):
+        cs[i + 1] = cs[i] + np.float64(price[i])
+    ns = len(slows)
+    out = np.zeros((len(SWEEP_COLUMNS), len(fasts) * ns))  # SoA: each metric contiguous
+    for k in prange(len(fasts) * ns):
+        fw = fasts[k // ns]
+        sw = slows[k % ns]
+        eq = cash
+        peak = cash
+        mdd = 0.0
+        held = False
+        pending = False
+        m = 0          # returns seen, Welford mean/M2, wins
+        mean = 0.0
+        m2 = 0.0
+        wins = 0
+        for i in range(n):
+            fast = (cs[i + 1] - cs[max(0, i + 1 - fw)]) / min(i + 1, fw)
+            slow = (cs[i + 1] - cs[max(0, i + 1 - sw)]) / min(i + 1, sw)
+            if i > 0:
+                r = 0.0
+                if held:
+                    r = np.float64(price[i]) / np.float64(price[i - 1]) - 1.0
+                    eq *= 1.0 + r
+                m += 1
+                d = r - mean
+                mean += d / m
+                m2 += d * (r - mean)
+                if r > 0.0:
+                    wins += 1
+                peak = max(peak, eq)
+                mdd = min(mdd, eq / peak - 1.0)
+            held = pending
+            pending = fast > slow
+        if m > 0:
+            std = np.sqrt(m2 / (m - 1)) if m > 1 else np.nan
+            out[0, k] = np.sqrt(ppyr) * (mean / (std + 1e-9))
+            out[1, k] = wins / m
+        out[2, k] = mdd
+        out[3, k] = eq - cash
+        out[4, k] = eq / cash - 1.0
+    return out
+
+def sweep_sma_cross(price: np.ndarray, cash_start: float, fasts, slows, ppyr: int) -> Dict[str, np.ndarray]:
+    """Metrics for every (fast, slow) pair as parallel columns, row-major over fasts then slows."""
+    price = np.asarray(price)
+    if price.dtype not in (np.float32, np.float64):
+        price = price.astype(np.float64)
+    fasts = np.asarray(fasts, dtype=np.int64)
+    slows = np.asarray(slows, dtype=np.int64)
+    res = _sma_cross_sweep(price, fasts, slows, float(cash_start), int(ppyr))
+    cols = {"sma_fast": np.repeat(fasts, len(slows)), "sma_slow": np.tile(slows, len(fasts))}
+    cols.update(zip(SWEEP_COLUMNS, res))
+    return cols
 
 # ---------- Metrics ----------
-def metrics_from_equity(eq: pd.Series, ppyr: int) -> EquityMetrics:
-    rets = eq.pct_change().dropna()
-    if len(rets) == 0:
-        return EquityMetrics(0.0, 0.0, 0.0, float(eq.iloc[-1]-eq.iloc[0]), float(eq.iloc[-1]/eq.iloc[0]-1))
-    sharpe = float(np.sqrt(ppyr) * (rets.mean() / (rets.std() + 1e-9)))
+def metrics_from_equity(eq: np.ndarray, ppyr: int) -> EquityMetrics:
+    a = np.asarray(eq, dtype=np.float64)
+    abs_ret = float(a[-1] - a[0])
+    rel_ret = float(a[-1]/a[0] - 1.0)
+    if len(a) < 2:
+        return EquityMetrics(0.0, 0.0, 0.0, abs_ret, rel_ret)
+    rets = np.diff(a) / a[:-1]
+    sharpe = float(np.sqrt(ppyr) * (rets.mean() / (rets.std(ddof=1) + 1e-9)))
     win_rate = float((rets > 0).mean())
-    roll_max = eq.cummax()
-    dd = (eq/roll_max - 1.0).min()
-    mdd = float(dd)
-    abs_ret = float(eq.iloc[-1] - eq.iloc[0])
-    rel_ret = float(eq.iloc[-1]/eq.iloc[0] - 1.0)
+    roll_max = np.maximum.accumulate(a)
+    mdd = float((a/roll_max - 1.0).min())
     return EquityMetrics(sharpe, win_rate, mdd, abs_ret, rel_ret)
 
 # ---------- Persistence / Cache ----------
@@ -152,16 +290,33 @@ def cache_key(req: BacktestRequest) -> str:
         "model": req.model, "strategy": req.strategy, "cash": req.cash_start,
         "sma_fast": req.sma_fast, "sma_slow": req.sma_slow,
     }
-    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+    return xxhash.xxh3_128_hexdigest(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS))
 
-def fetch_cached(req: BacktestRequest):
+def fetch_cached_or_load(req: BacktestRequest) -> Tuple[Optional[Dict], Optional[OHLCV]]:
+    """
+    Cache lookup and OHLCV load in one BigQuery script (one job, one roundtrip).
+    The script's final SELECT is either the cached metrics row or the bars,
+    so the result schema tells us which branch ran.
+    """
     client = bq()
     q = f"""
-      SELECT id, metrics_json
-      FROM `{TABLE_BT}`
-      WHERE symbol=@s AND timeframe=@tf AND start_ts=@st AND end_ts=@en
-        AND model=@m AND strategy=@str AND id=@id
-      ORDER BY requested_at DESC LIMIT 1
+      DECLARE cached STRING DEFAULT (
+        SELECT metrics_json
+        FROM `{TABLE_BT}`
+        WHERE symbol=@s AND timeframe=@tf AND start_ts=@st AND end_ts=@en
+          AND model=@m AND strategy=@str AND id=@id
+        ORDER BY requested_at DESC LIMIT 1
+      );
+      IF cached IS NOT NULL THEN
+        SELECT cached AS metrics_json;
+      ELSE
+        SELECT ts, close
+        FROM `{TABLE_OHLCV}`
+        WHERE symbol=@s AND timeframe=@tf
+          AND ts BETWEEN @st AND @en
+          AND DATE(ts) BETWEEN DATE(@st) AND DATE(@en)
+        ORDER BY ts;
+      END IF;
     """
     job = client.query(
         q,
@@ -177,12 +332,14 @@ def fetch_cached(req: BacktestRequest):
             ]
         ),
     )
-    rows = list(job.result())
-    return None if not rows else json.loads(rows[0].metrics_json)
-
-def persist_result(req: BacktestRequest, metrics: Dict, duration_ms: int):
-    client = bq()
-    row = {
+    result = job.result()
+    if [f.name for f in result.schema] == ["metrics_json"]:
+        rows = list(result)
+        return json.loads(rows[0].metrics_json), None
+    return None, _bars_from_arrow(result.to_arrow(bqstorage_client=bqs()))
+
+def result_row(req: BacktestRequest, metrics: Dict, duration_ms: int) -> Dict:
+    return {
         "id": cache_key(req),
         "requested_at": pd.Timestamp.utcnow().isoformat(),
         "symbol": req.symbol,
@@ -195,14 +352,84 @@ def persist_result(req: BacktestRequest, metrics: Dict, duration_ms: int):
         "metrics_json": json.dumps(metrics),
         "duration_ms": duration_ms,
     }
-    client.insert_rows_json(TABLE_BT, [row])
+
+@lru_cache(maxsize=1)
+def backtests_schema() -> Tuple[bigquery.SchemaField, ...]:
+    # fetched once per process instead of a get_table per flush
+    return tuple(bq().get_table(TABLE_BT).schema)
+
+def flush_rows(rows: List[Dict]):
+    # one load job instead of N streaming inserts (no per-row billing / rate limits)
+    job_config = bigquery.LoadJobConfig(
+        schema=list(backtests_schema()),
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+    )
+    bq().load_table_from_json(rows, TABLE_BT, job_config=job_config).result()
+
+def insert_row(row: Dict):
+    # unbatched write (worker not running): a streaming insert, so it spends no load-job quota
+    errors = bq().insert_rows_json(TABLE_BT, [row])
+    if errors:
+        raise RuntimeError(f"insert_rows_json failed: {errors}")
+
+_persist_q: Optional[asyncio.Queue] = None
+_persist_task: Optional[asyncio.Task] = None
+
+async def _persist_worker(q: asyncio.Queue):
+    # batch every row that arrives within PERSIST_MAX_AGE_S of the first, so load jobs are at
+    # least that far apart however bursty the traffic; None = drain and exit
+    loop = asyncio.get_running_loop()
+    done = False
+    while not done:
+        row = await q.get()
+        if row is None:
+            break
+        rows = [row]
+        deadline = loop.time() + PERSIST_MAX_AGE_S
+        while True:
+            try:
+                row = await asyncio.wait_for(q.get(), timeout=deadline - loop.time())
+            except asyncio.TimeoutError:
+                break
+            if row is None:
+                done = True
+                break
+            rows.append(row)
+        try:
+            await run_in_threadpool(flush_rows, rows)
+            logger.info("Persisted %d backtest rows", len(rows))
+        except Exception:
+            logger.exception("Failed to persist %d backtest rows", len(rows))
 
 # ---------- Endpoints ----------
+@app.on_event("startup")
+def warm_jit():
+    # compile (or load from the on-disk cache) before the first request pays for it
+    dummy = np.linspace(1.0, 2.0, 1024)
+    _sma_cross_equity(dummy.astype(np.float32), 10, 30, 1.0)  # API bars
+    _sma_cross_equity(dummy, 10, 30, 1.0)                     # local CLI / f64 callers
+    windows = np.array([10, 30], dtype=np.int64)
+    _sma_cross_sweep(dummy.astype(np.float32), windows, windows, 1.0, 365)
+
+@app.on_event("startup")
+async def start_persist_worker():
+    global _persist_q, _persist_task
+    _persist_q = asyncio.Queue()
+    _persist_task = asyncio.create_task(_persist_worker(_persist_q))
+
+@app.on_event("shutdown")
+async def stop_persist_worker():
+    global _persist_q
+    if _persist_q is not None:
+        _persist_q.put_nowait(None)
+        await _persist_task
+        _persist_q = None
+
 @app.get("/health")
 def health():
     return {"ok": True}
 
-@app.get("/symbols")
+@app.get("/symbols", response_class=ORJSONResponse)
 def symbols():
     logger.info("Fetching symbols from %s", TABLE_OHLCV)
     client = bq()
@@ -214,60 +441,104 @@ def symbols():
     """
     rows = [dict(r) for r in client.query(q).result()]
     logger.info("Returning %d symbols", len(rows))
-    return rows
+    # orjson encodes the TIMESTAMP datetimes natively; skips jsonable_encoder's per-value walk
+    return ORJSONResponse(rows)
+
+def _compute(req: BacktestRequest, bars: OHLCV) -> Tuple[Dict, np.ndarray]:
+    # CPU-bound part of a backtest: forecast RMSE, equity curve, metrics
+    # forecast series (we calculate RMSE vs close)
+    preds = model_predict(bars.close, req.model, req.sma_fast, req.sma_slow)
+    err = bars.close.astype(np.float64) - preds
+    rmse = float(np.sqrt(np.mean(err**2)))
+
+    # equity
+    if req.strategy == "buy_hold":
+        eq = equity_buy_hold(bars.close, req.cash_start)
+    else:
+        eq = equity_sma_cross(bars.close, req.cash_start, req.sma_fast, req.sma_slow)
 
-@app.post("/backtest")
-def backtest(req: BacktestRequest):
+    m = metrics_from_equity(eq, periods_per_year(req.timeframe))
+    metrics = {
+        "sharpe": m.sharpe,
+        "win_rate": m.win_rate,
+        "max_drawdown": m.max_drawdown,
+        "abs_return_usd": m.abs_return_usd,
+        "rel_return": m.rel_return,
+        "rmse": rmse,
+    }
+    return metrics, eq
+
+@app.post("/backtest", response_class=ORJSONResponse)
+async def backtest(req: BacktestRequest, downsample: Optional[int] = Query(None, ge=2)):
+    """
+    Prices are held as float32 (~7 significant digits); SMAs, equity and all
+    reported metrics are accumulated in float64, so precision loss is limited
+    to sub-cent rounding of the input prices.
+
+    `series` is columnar: `ts` is epoch milliseconds (UTC) and `equity` the
+    matching values, both serialized straight from NumPy by orjson.
+    `?downsample=N` strides the returned series down to at most ~N points
+    (first and last bar always kept); metrics always use every bar.
+    """
     payload = req.model_dump()
     logger.info("Received backtest request: %s", json.dumps(payload, sort_keys=True))
     t0 = time.time()
     cache_id = cache_key(req)
-    # try cache first
-    cached = fetch_cached(req)
+    # cache lookup + bar load share one BigQuery job
+    cached, bars = await run_in_threadpool(fetch_cached_or_load, req)
     if cached:
         logger.info("Cache hit for request %s", cache_id)
         cached["_cached"] = True
         logger.info("Returning cached metrics: %s", json.dumps(cached, sort_keys=True))
-        return {"summary": req.model_dump(), "metrics": cached, "equity_curve": []}
+        return {"summary": req.model_dump(), "metrics": cached, "series": {"ts": [], "equity": []}}
 
-    df = load_ohlcv(req.symbol, req.timeframe, req.start, req.end)
     logger.info(
         "Loaded %d OHLCV rows for %s %s between %s and %s",
-        len(df),
+        len(bars),
         req.symbol,
         req.timeframe,
         req.start,
         req.end,
     )
 
-    # forecast series (we calculate RMSE vs close)
-    preds = model_predict(df, req.model, req.sma_fast, req.sma_slow)
-    err = df["close"].astype(float) - preds
-    rmse = float(np.sqrt(np.mean(err**2)))
-
-    # equity
-    if req.strategy == "buy_hold":
-        eq = equity_buy_hold(df, req.cash_start)
-    else:
-        eq = equity_sma_cross(df, req.cash_start, req.sma_fast, req.sma_slow)
-
-    m = metrics_from_equity(eq, periods_per_year(req.timeframe))
-    metrics = {
-        "sharpe": m.sharpe,
-        "win_rate": m.win_rate,
-        "max_drawdown": m.max_drawdown,
-        "abs_return_usd": m.abs_return_usd,
-        "rel_return": m.rel_return,
-        "rmse": rmse,
-    }
+    metrics, eq = await run_in_threadpool(_compute, req, bars)
     duration_ms = int((time.time() - t0) * 1000)
     logger.info("Computed metrics in %d ms: %s", duration_ms, json.dumps(metrics, sort_keys=True))
 
-    # persist
-    persist_result(req, metrics, duration_ms)
-    logger.info("Persisted backtest result for %s", cache_id)
-
-    curve = [{"ts": str(ts), "equity": float(val)} for ts, val in eq.items()]
-    response_payload = {"summary": req.model_dump(), "metrics": metrics, "equity_curve": curve}
-    logger.info("Sending backtest response with %d equity points", len(response_payload["equity_curve"]))
-    return response_payload
+    # persist (buffered; streaming insert when the batch worker isn't running)
+    row = result_row(req, metrics, duration_ms)
+    if _persist_q is not None:
+        _persist_q.put_nowait(row)
+        logger.info("Queued backtest result for %s", cache_id)
+    else:
+        await run_in_threadpool(insert_row, row)
+        logger.info("Persisted backtest result for %s", cache_id)
+
+    ts_ms = bars.ts // 1_000_000  # ns -> epoch ms
+    if downsample and len(eq) > downsample:
+        idx = np.arange(0, len(eq), -(-len(eq) // downsample))
+        if idx[-1] != len(eq) - 1:
+            idx = np.append(idx, len(eq) - 1)
+        ts_ms, eq = ts_ms[idx], eq[idx]
+    series = {"ts": ts_ms, "equity": eq}
+    response_payload = {"summary": req.model_dump(), "metrics": metrics, "series": series}
+    logger.info("Sending backtest response with %d equity points", len(eq))
+    return ORJSONResponse(response_payload)
+
+@app.post("/backtest/sweep", response_class=ORJSONResponse)
+async def backtest_sweep(req: SweepRequest):
+    """
+    Grid of SMA-cross backtests over one window: cartesian product of
+    `sma_fasts` x `sma_slows`, computed in a single parallel Numba pass.
+    Returns parallel columns (sma_fast, sma_slow, sharpe, ...), one entry per
+    pair; no equity curves and nothing is cached or persisted.
+    """
+    logger.info("Received sweep request: %s", json.dumps(req.model_dump(), sort_keys=True))
+    t0 = time.time()
+    bars = await run_in_threadpool(load_ohlcv, req.symbol, req.timeframe, req.start, req.end)
+    results = await run_in_threadpool(
+        sweep_sma_cross, bars.close, req.cash_start, req.sma_fasts, req.sma_slows, periods_per_year(req.timeframe)
+    )
+    duration_ms = int((time.time() - t0) * 1000)
+    logger.info("Swept %d parameter pairs over %d bars in %d ms", len(results["sma_fast"]), len(bars), duration_ms)
+    return ORJSONResponse({"summary": {**req.model_dump(), "bars": len(bars), "duration_ms": duration_ms}, "results": results})
@@ -3,13 +3,14 @@ import pandas as pd
 from ..models import arima, prophet, xgb, lstm
 from ..strategies import buy_hold, sma_cross, rsi_meanrev
 from dataclasses import dataclass
+from functools import lru_cache
 
 MODELS = {"arima": arima.Model, "prophet": prophet.Model, "xgb": xgb.Model, "lstm": lstm.Model}
 STRATS = {"buy_hold": buy_hold.Strategy, "sma_cross": sma_cross.Strategy, "rsi_meanrev": rsi_meanrev.Strategy}
 
 @dataclass
 class Result:
-    equity_series: list[tuple[pd.Timestamp,float]]
+    equity: pd.Series
     perf_metrics: dict
     y_true: np.ndarray
     y_pred: np.ndarray
@@ -29,27 +30,29 @@ def run_backtest(df: pd.DataFrame, req):
     strat = STRATS[req.strategy](**req.strategy_params)
     pos = strat.generate_positions(price=test, forecast=pd.Series(y_pred, index=test.index))
 
-    ret = test.pct_change().fillna(0.0)
+    p = test.to_numpy(dtype=np.float64)
+    ret = pd.Series(np.concatenate(([0.0], np.diff(p) / p[:-1])), index=test.index)
     strat_ret = (pos.shift(1).fillna(0.0) * ret)  # next-bar execution
     equity = (1 + strat_ret).cumprod() * req.initial_cash
 
-    perf = _perf_metrics(strat_ret, equity, req.initial_cash)
-    return Result(equity_series=list(zip(equity.index, equity.values)), perf_metrics=perf, y_true=y_true, y_pred=y_pred)
+    perf = _perf_metrics(strat_ret, equity, req.initial_cash, req.timeframe)
+    return Result(equity=equity, perf_metrics=perf, y_true=y_true, y_pred=y_pred)
 
+@lru_cache(maxsize=32)
 def _tf_minutes(tf: str) -> int:
     if tf.endswith("m"): return int(tf[:-1])
     if tf.endswith("h"): return int(tf[:-1]) * 60
     if tf.endswith("d"): return int(tf[:-1]) * 1440
     raise ValueError(tf)
 
-def _perf_metrics(returns: pd.Series, equity: pd.Series, initial_cash: float) -> dict:
+def _perf_metrics(returns: pd.Series, equity: pd.Series, initial_cash: float, timeframe: str) -> dict:
     rf = 0.0
-    ann = np.sqrt(365*24*60/_tf_minutes("60"))  # approximate if 1h; refine per tf
-    sharpe = (returns.mean() - rf) / (returns.std() + 1e-9) * np.sqrt(365*24)
+    ann = np.sqrt(365*24*60/_tf_minutes(timeframe))  # bars per year for this timeframe
+    sharpe = (returns.mean() - rf) / (returns.std() + 1e-9) * ann
     downside = returns[returns < 0].std() + 1e-9
-    sortino = (returns.mean() - rf) / downside * np.sqrt(365*24)
-    roll_max = equity.cummax()
-    dd = (equity/roll_max - 1).min()
+    sortino = (returns.mean() - rf) / downside * ann
+    eq = equity.to_numpy(dtype=np.float64)
+    dd = (eq/np.maximum.accumulate(eq) - 1).min()
     wins = (returns > 0).sum(); trades = (returns != 0).sum()
     abs_ret = equity.iloc[-1] - initial_cash
     rel_ret = equity.iloc[-1] / initial_cash - 1
@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+import numpy as np
+
+_BASELINE_CACHE: "OrderedDict[Hashable, float]" = OrderedDict()
+_BASELINE_CACHE_SIZE = 512
+_BASELINE_LOCK = threading.Lock()  # sync /run handlers share the LRU from the threadpool
+
+def model_errors(y_true: np.ndarray, y_pred: np.ndarray) -> tuple[float, float, float]:
+    y_true = np.asarray(y_true, dtype=np.float64); y_pred = np.asarray(y_pred, dtype=np.float64)
+    err = y_true - y_pred
+    rmse = float(np.sqrt(np.mean(err**2)))
+    mae = float(np.mean(np.abs(err)))
+    mape = float(np.mean(np.abs(err) / np.maximum(np.abs(y_true), 1e-9)))
+    return rmse, mae, mape
+
+def _css_residuals(params: np.ndarray, dy: np.ndarray) -> np.ndarray:
+    # ARMA(1,1) innovations e_t = dy_t - phi*dy_{t-1} - theta*e_{t-1}, conditioned on zeros before t=0
+    from scipy.signal import lfilter
+    phi, theta = params
+    return lfilter([1.0, -phi], [1.0, theta], dy)
+
+def _fit_arima_rmse(y: np.ndarray) -> float:
+    # ARIMA(1,1,1) == ARMA(1,1) on the first difference; fit by conditional sum of squares
+    # rather than exact MLE -- a Kalman-filter likelihood is far too slow for a baseline number
+    from scipy.optimize import minimize
+    dy = np.diff(y)
+    def css(p):
+        e = _css_residuals(p, dy)
+        return float(np.dot(e, e))
+    res = minimize(css, x0=np.zeros(2), method="L-BFGS-B",
+                   bounds=[(-0.99, 0.99), (-0.99, 0.99)], options={"maxiter": 25})
+    e = _css_residuals(res.x, dy)  # one-step errors on y == innovations on dy
+    return float(np.sqrt(np.mean(e**2)))
+
+def cached_baseline_rmse(key: Hashable) -> Optional[float]:
+    with _BASELINE_LOCK:
+        rmse = _BASELINE_CACHE.get(key)
+        if rmse is not None:
+            _BASELINE_CACHE.move_to_end(key)
+        return rmse
+
+def remember_baseline_rmse(key: Hashable, rmse: float) -> None:
+    with _BASELINE_LOCK:
+        _BASELINE_CACHE[key] = rmse
+        _BASELINE_CACHE.move_to_end(key)
+        if len(_BASELINE_CACHE) > _BASELINE_CACHE_SIZE:
+            _BASELINE_CACHE.popitem(last=False)
+
+def baseline_arima_rmse(y_true: np.ndarray) -> float:
+    # ARIMA(1,1,1) one-step RMSE; callers memoize per window via cached/remember_baseline_rmse
+    y = np.asarray(y_true, dtype=np.float64)
+    return _fit_arima_rmse(y) if len(y) > 2 else float("nan")
@@ -1,14 +1,52 @@
+import os
+import logging
+from typing import Optional
+
 import pandas as pd
-from google.cloud import bigquery
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery, bigquery_storage
 from datetime import datetime
 
+logger = logging.getLogger("alphagini.api.bigquery")
+
+PROJECT = os.environ.get("ALPHAGINI_PROJECT")
+DATASET_EXP = os.environ.get("ALPHAGINI_EXP_DATASET", "alphagini_experiments")
+TABLE_BASELINES = f"{PROJECT}.{DATASET_EXP}.arima_baselines"
+BASELINES_SCHEMA = [
+    bigquery.SchemaField("exchange", "STRING"),
+    bigquery.SchemaField("symbol", "STRING"),
+    bigquery.SchemaField("timeframe", "STRING"),
+    bigquery.SchemaField("start_ts", "TIMESTAMP"),
+    bigquery.SchemaField("end_ts", "TIMESTAMP"),
+    bigquery.SchemaField("lookback_days", "INT64"),
+    bigquery.SchemaField("rmse", "FLOAT64"),
+    bigquery.SchemaField("computed_at", "TIMESTAMP"),
+]
+
+_bq = None
+_bqs = None
+_baselines_ready = False
+
+def _client() -> bigquery.Client:
+    global _bq
+    if _bq is None:
+        _bq = bigquery.Client()
+    return _bq
+
+def _read_client() -> bigquery_storage.BigQueryReadClient:
+    global _bqs
+    if _bqs is None:
+        _bqs = bigquery_storage.BigQueryReadClient()
+    return _bqs
+
 def load_ohlcv(exchange:str, symbol:str, timeframe:str, start:datetime, end:datetime) -> pd.DataFrame:
-    client = bigquery.Client()
+    client = _client()
     q = """
     SELECT ts, open, high, low, close, volume
     FROM `PROJECT.marketdata.ohlcv`
     WHERE exchange=@exchange AND symbol=@symbol AND timeframe=@tf
       AND ts BETWEEN @start AND @end
+      AND DATE(ts) BETWEEN DATE(@start) AND DATE(@end)  -- partition pruning
     ORDER BY ts
     """
     job = client.query(q, job_config=bigquery.QueryJobConfig(
@@ -20,5 +58,63 @@ def load_ohlcv(exchange:str, symbol:str, timeframe:str, start:datetime, end:date
             bigquery.ScalarQueryParameter("end","TIMESTAMP",end),
         ]
     ))
-    df = job.result().to_dataframe()
+    tbl = job.result().to_arrow(bqstorage_client=_read_client())
+    df = tbl.to_pandas(self_destruct=True, split_blocks=True)
     return df.set_index("ts")
+
+def _ensure_baselines_table() -> None:
+    """Create arima_baselines on first persist (fresh deployments don't have it)"""
+    global _baselines_ready
+    if not _baselines_ready:
+        _client().create_table(bigquery.Table(TABLE_BASELINES, schema=BASELINES_SCHEMA), exists_ok=True)
+        _baselines_ready = True
+
+def _window_params(exchange:str, symbol:str, timeframe:str, start:datetime, end:datetime, lookback_days:int):
+    return [
+        bigquery.ScalarQueryParameter("exchange","STRING",exchange),
+        bigquery.ScalarQueryParameter("symbol","STRING",symbol),
+        bigquery.ScalarQueryParameter("tf","STRING",timeframe),
+        bigquery.ScalarQueryParameter("start","TIMESTAMP",start),
+        bigquery.ScalarQueryParameter("end","TIMESTAMP",end),
+        bigquery.ScalarQueryParameter("lookback","INT64",lookback_days),
+    ]
+
+def fetch_baseline_rmse(exchange:str, symbol:str, timeframe:str, start:datetime, end:datetime, lookback_days:int) -> Optional[float]:
+    client = _client()
+    q = f"""
+    SELECT rmse
+    FROM `{TABLE_BASELINES}`
+    WHERE exchange=@exchange AND symbol=@symbol AND timeframe=@tf
+      AND start_ts=@start AND end_ts=@end AND lookback_days=@lookback
+    ORDER BY computed_at DESC LIMIT 1
+    """
+    try:
+        job = client.query(q, job_config=bigquery.QueryJobConfig(
+            query_parameters=_window_params(exchange, symbol, timeframe, start, end, lookback_days)
+        ))
+        rows = list(job.result())
+    except NotFound:
+        return None  # table not created yet: a cache miss, the baseline gets fitted and persisted
+    return None if not rows else float(rows[0].rmse)
+
+def persist_baseline_rmse(exchange:str, symbol:str, timeframe:str, start:datetime, end:datetime, lookback_days:int, rmse:float) -> None:
+    client = _client()
+    row = {
+        "exchange": exchange,
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "start_ts": pd.Timestamp(start).isoformat(),
+        "end_ts": pd.Timestamp(end).isoformat(),
+        "lookback_days": lookback_days,
+        "rmse": rmse,
+        "computed_at": pd.Timestamp.utcnow().isoformat(),
+    }
+    try:
+        _ensure_baselines_table()
+        errors = client.insert_rows_json(TABLE_BASELINES, [row])
+    except Exception:
+        logger.exception("Failed to persist baseline RMSE for %s %s %s", exchange, symbol, timeframe)
+        return
+    if errors:
+        # the fitted value is still returned to the caller; only the shared cache misses out
+        logger.error("Baseline RMSE insert rejected for %s %s %s: %s", exchange, symbol, timeframe, errors)
@@ -1,22 +1,36 @@
 from fastapi import APIRouter, HTTPException
-from ..schemas import BacktestRequest, BacktestResponse, EquityPoint, Metrics, ModelMetrics
-from ..data.bigquery import load_ohlcv
+from ..schemas import BacktestRequest, BacktestResponse, EquitySeries, Metrics, ModelMetrics
+from ..data.bigquery import load_ohlcv, fetch_baseline_rmse, persist_baseline_rmse
 from ..backtester.engine import run_backtest
-from ..backtester.metrics import model_errors, baseline_arima_rmse
+from ..backtester.metrics import model_errors, baseline_arima_rmse, cached_baseline_rmse, remember_baseline_rmse
+import math
 import uuid
 
 router = APIRouter()
 
+def _baseline_rmse(req: BacktestRequest, y_true) -> float:
+    # process LRU -> arima_baselines table -> fit (and persist for every other worker)
+    key = (req.exchange, req.symbol, req.timeframe, req.start, req.end, req.lookback_days)
+    rmse = cached_baseline_rmse(key)
+    if rmse is None:
+        rmse = fetch_baseline_rmse(*key)
+        if rmse is None:
+            rmse = baseline_arima_rmse(y_true)
+            if math.isfinite(rmse):
+                persist_baseline_rmse(*key, rmse=rmse)
+        remember_baseline_rmse(key, rmse)
+    return rmse
+
 @router.post("/run", response_model=BacktestResponse)
 def run(req: BacktestRequest):
     df = load_ohlcv(req.exchange, req.symbol, req.timeframe, req.start, req.end)
     if df.empty: raise HTTPException(404, "No data in range")
-    result = run_backtest(df=df, req=req)  # returns equity_series, perf_metrics, y_true, y_pred
+    result = run_backtest(df=df, req=req)  # returns equity, perf_metrics, y_true, y_pred
     rmse, mae, mape = model_errors(result.y_true, result.y_pred)
-    base_rmse = baseline_arima_rmse(result.y_true)
+    base_rmse = _baseline_rmse(req, result.y_true)  # ARIMA(1,1,1) one-step, whatever req.model is
     return BacktestResponse(
         run_id=str(uuid.uuid4()),
-        equity_curve=[EquityPoint(ts=t, equity=e) for t,e in result.equity_series],
+        series=EquitySeries(ts=result.equity.index.as_unit("ms").asi8.tolist(), equity=result.equity.to_numpy().tolist()),
         metrics=Metrics(**result.perf_metrics),
         model_metrics=ModelMetrics(rmse=rmse, mae=mae, mape=mape, baseline_rmse=base_rmse)
     )
@@ -1,11 +1,17 @@
-from pydantic import BaseModel, Field
-from typing import Literal, Optional, Dict, List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Optional, Dict, List
 from datetime import datetime
+from enum import Enum
 
-ModelName = Literal["arima","prophet","xgb","lstm"]
-StrategyName = Literal["buy_hold","sma_cross","rsi_meanrev","breakout"]
+# str-valued enums: members compare/hash as their plain string, so MODELS/STRATS lookups are unchanged
+class ModelName(str, Enum):
+    ARIMA = "arima"; PROPHET = "prophet"; XGB = "xgb"; LSTM = "lstm"
+
+class StrategyName(str, Enum):
+    BUY_HOLD = "buy_hold"; SMA_CROSS = "sma_cross"; RSI_MEANREV = "rsi_meanrev"; BREAKOUT = "breakout"
 
 class BacktestRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid", protected_namespaces=())
     exchange: str = "binance"
     symbol: str = "BTC/USDT"
     timeframe: str = "1h"
@@ -18,9 +24,9 @@ class BacktestRequest(BaseModel):
     strategy_params: Dict = {}
     initial_cash: float = 100_000.0
 
-class EquityPoint(BaseModel):
-    ts: datetime
-    equity: float
+class EquitySeries(BaseModel):
+    ts: List[int]        # epoch ms (UTC), parallel to equity
+    equity: List[float]
 
 class Metrics(BaseModel):
     sharpe: float; sortino: float; max_dd: float
@@ -33,6 +39,6 @@ class ModelMetrics(BaseModel):
 
 class BacktestResponse(BaseModel):
     run_id: str
-    equity_curve: List[EquityPoint]
+    series: EquitySeries
     metrics: Metrics
     model_metrics: ModelMetrics
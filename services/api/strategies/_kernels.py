@@ -0,0 +1,42 @@
+import numpy as np
+
+from ._njit import njit
+
+@njit(cache=True)  # no fastmath: NaN comparisons must stay False
+def sma_cross_kernel(price, forecast, fast, slow, out):
+    # one pass: running window sums for both SMAs, trend & edge fused into the write.
+    # NaN prices are kept out of the sums and counted per window instead; like
+    # rolling(w).mean(), a window holding a NaN has no SMA, and the sums recover
+    # once it slides out
+    sum_fast = 0.0
+    sum_slow = 0.0
+    nan_fast = 0
+    nan_slow = 0
+    warm = max(fast, slow) - 1
+    for i in range(price.shape[0]):
+        p = price[i]
+        if np.isnan(p):
+            nan_fast += 1
+            nan_slow += 1
+        else:
+            sum_fast += p
+            sum_slow += p
+        if i >= fast:
+            q = price[i - fast]
+            if np.isnan(q):
+                nan_fast -= 1
+            else:
+                sum_fast -= q
+        if i >= slow:
+            q = price[i - slow]
+            if np.isnan(q):
+                nan_slow -= 1
+            else:
+                sum_slow -= q
+        # sum_fast/fast > sum_slow/slow, cross-multiplied to skip the divisions
+        if (i >= warm and nan_fast == 0 and nan_slow == 0
+                and sum_fast * slow > sum_slow * fast and forecast[i] > p):
+            out[i] = 1.0
+        else:
+            out[i] = 0.0
+    return out
@@ -0,0 +1,7 @@
+try:
+    from numba import njit
+except ImportError:  # numba is optional: fall back to plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda fn: fn
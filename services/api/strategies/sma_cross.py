@@ -1,12 +1,15 @@
+import numpy as np
 import pandas as pd
 
+from ._kernels import sma_cross_kernel
+
 class Strategy:
     def __init__(self, fast:int=10, slow:int=50):
         self.fast, self.slow = fast, slow
     def generate_positions(self, price: pd.Series, forecast: pd.Series) -> pd.Series:
         # simple: if forecast above current -> long signal, filtered by MA trend
-        ma_fast = price.rolling(self.fast).mean()
-        ma_slow = price.rolling(self.slow).mean()
-        trend = (ma_fast > ma_slow).astype(float)
-        edge = (forecast > price).astype(float)
-        return (trend & edge).astype(float)
+        p = price.to_numpy(dtype=np.float64)
+        f = forecast.to_numpy(dtype=np.float64)
+        out = np.empty(len(p), dtype=np.float32)
+        sma_cross_kernel(p, f, int(self.fast), int(self.slow), out)
+        return pd.Series(out, index=price.index)
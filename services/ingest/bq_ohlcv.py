@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Shared BigQuery write path for the ohlcv table, used by ccxt_ingest.py and the backfills:
+schema, Parquet load-job uploads and Storage Write API appends.
+"""
+
+import os
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.api_core.exceptions import NotFound
+from google.cloud import bigquery
+
+LABEL_COLS = ("exchange", "symbol", "timeframe")
+VALUE_COLS = ("open", "high", "low", "close", "volume")
+
+# Storage Write API instead of load jobs (no per-table daily job quota); 0 keeps Parquet load jobs
+USE_STORAGE_WRITE = os.environ.get("ALPHAGINI_USE_STORAGE_WRITE", "0") == "1"
+WRITE_CHUNK_ROWS = 10_000  # rows per AppendRows request, well under the 10 MB cap
+
+# Values keep full FLOAT64 precision; ALPHAGINI_PRESERVE_FP64=0 opts in to float32 uploads
+# (half the bytes, but prices are quantized for good once BigQuery widens them back)
+PRESERVE_FP64 = os.environ.get("ALPHAGINI_PRESERVE_FP64", "1") == "1"
+VALUE_DTYPE = "float64" if PRESERVE_FP64 else "float32"
+
+# Explicit layout for Parquet uploads, so BigQuery never autodetects (NaN volumes used to trip it);
+# the constant label columns go up dictionary-encoded
+ARROW_SCHEMA = pa.schema([
+    *[(c, pa.dictionary(pa.int32(), pa.string())) for c in LABEL_COLS],
+    ("ts", pa.timestamp("us", tz="UTC")),  # BigQuery TIMESTAMP is microsecond
+    *[(c, pa.from_numpy_dtype(VALUE_DTYPE)) for c in VALUE_COLS],
+])
+BQ_SCHEMA = [
+    *[bigquery.SchemaField(c, "STRING") for c in LABEL_COLS],
+    bigquery.SchemaField("ts", "TIMESTAMP"),
+    *[bigquery.SchemaField(c, "FLOAT64") for c in VALUE_COLS],
+]
+# Layout of a freshly created ohlcv table; tables from before clustering keep DAY(ts) only
+TIME_PARTITIONING = bigquery.TimePartitioning(type_=bigquery.TimePartitioningType.DAY, field="ts")
+CLUSTERING_FIELDS = list(LABEL_COLS)
+
+def ohlcv_arrow_table(df: pd.DataFrame) -> pa.Table:
+    """df (label, ts and value columns) as an Arrow table in ARROW_SCHEMA"""
+    df = df.astype({
+        **{c: "category" for c in LABEL_COLS},
+        **{c: VALUE_DTYPE for c in VALUE_COLS},
+    })
+    return pa.Table.from_pandas(df[list(ARROW_SCHEMA.names)], schema=ARROW_SCHEMA, preserve_index=False)
+
+def df_to_parquet_upload(df: pd.DataFrame, client: bigquery.Client, table_id: str) -> None:
+    """Write df to a snappy Parquet temp file and append it with load_table_from_file"""
+    job_config = bigquery.LoadJobConfig(
+        source_format=bigquery.SourceFormat.PARQUET,
+        write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+        schema=BQ_SCHEMA,
+    )
+    try:
+        client.get_table(table_id)
+    except NotFound:
+        # Only a load job that creates the table may declare its layout; on an existing table
+        # a spec that differs from it (e.g. no clustering) fails the job
+        job_config.time_partitioning = TIME_PARTITIONING
+        job_config.clustering_fields = CLUSTERING_FIELDS
+    with tempfile.NamedTemporaryFile(suffix=".parquet", delete=False) as tmp:
+        tmp_path = tmp.name
+    try:
+        pq.write_table(ohlcv_arrow_table(df), tmp_path, compression="snappy")
+        with open(tmp_path, "rb") as fh:
+            job = client.load_table_from_file(fh, table_id, job_config=job_config)
+            job.result()  # Wait for completion
+    finally:
+        os.unlink(tmp_path)
+
+def _ohlcv_row_class():
+    """Build the OhlcvRow protobuf at runtime; fields mirror BQ_SCHEMA"""
+    from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+    fdp = descriptor_pb2.FileDescriptorProto(name="alphagini_ohlcv.proto", package="alphagini")
+    msg = fdp.message_type.add(name="OhlcvRow")
+    fields = [(c, "TYPE_STRING") for c in LABEL_COLS]
+    fields += [("ts", "TYPE_INT64")]  # TIMESTAMP as epoch microseconds
+    fields += [(c, "TYPE_DOUBLE") for c in VALUE_COLS]
+    for number, (name, ftype) in enumerate(fields, start=1):
+        msg.field.add(
+            name=name, number=number,
+            type=getattr(descriptor_pb2.FieldDescriptorProto, ftype),
+            label=descriptor_pb2.FieldDescriptorProto.LABEL_OPTIONAL,
+        )
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(fdp)
+    return message_factory.GetMessageClass(pool.FindMessageTypeByName("alphagini.OhlcvRow"))
+
+class StorageWriter:
+    """One AppendRows connection on a table's _default stream; append() may be called from several threads"""
+
+    def __init__(self, table_id: str, chunk_rows: int = WRITE_CHUNK_ROWS):
+        # Imported here: only the ALPHAGINI_USE_STORAGE_WRITE=1 path needs google-cloud-bigquery-storage
+        from google.cloud import bigquery_storage_v1
+        from google.cloud.bigquery_storage_v1 import types as bqs_types, writer as bqs_writer
+        from google.protobuf import descriptor_pb2
+
+        self.row_cls = _ohlcv_row_class()
+        self.chunk_rows = chunk_rows
+        project, dataset, table = table_id.split(".")
+        proto_descriptor = descriptor_pb2.DescriptorProto()
+        self.row_cls.DESCRIPTOR.CopyToProto(proto_descriptor)
+        template = bqs_types.AppendRowsRequest(
+            write_stream=f"projects/{project}/datasets/{dataset}/tables/{table}/streams/_default",
+            proto_rows=bqs_types.AppendRowsRequest.ProtoData(
+                writer_schema=bqs_types.ProtoSchema(proto_descriptor=proto_descriptor)
+            ),
+        )
+        self.stream = bqs_writer.AppendRowsStream(bigquery_storage_v1.BigQueryWriteClient(), template)
+        self.lock = threading.Lock()  # send() is not thread-safe
+        self.rows_type, self.request_type = bqs_types.ProtoRows, bqs_types.AppendRowsRequest
+
+    def append(self, df: pd.DataFrame) -> int:
+        """Send df in chunk_rows-row AppendRows requests and wait for every one; returns rows written"""
+        ts_us = df["ts"].dt.as_unit("us").astype("int64").to_numpy()
+        labels = [df[c].to_numpy() for c in LABEL_COLS]
+        vals = [df[c].to_numpy(dtype=np.float64) for c in VALUE_COLS]
+        futures = []
+        for lo in range(0, len(df), self.chunk_rows):
+            rows = self.rows_type()
+            for i in range(lo, min(lo + self.chunk_rows, len(df))):
+                row = self.row_cls(
+                    exchange=labels[0][i], symbol=labels[1][i], timeframe=labels[2][i], ts=int(ts_us[i]),
+                    open=vals[0][i], high=vals[1][i], low=vals[2][i], close=vals[3][i],
+                )
+                if not np.isnan(vals[4][i]):  # leave NaN volume unset -> NULL
+                    row.volume = vals[4][i]
+                rows.serialized_rows.append(row.SerializeToString())
+            req = self.request_type(proto_rows=self.request_type.ProtoData(rows=rows))
+            with self.lock:
+                futures.append(self.stream.send(req))
+        for f in futures:
+            f.result()
+        return len(df)
+
+    def close(self):
+        self.stream.close()
+
+def storage_write_append(df: pd.DataFrame, table_id: str) -> None:
+    """One-shot append of df on the table's _default stream (no load-job quota)"""
+    writer = StorageWriter(table_id)
+    try:
+        writer.append(df)
+    finally:
+        writer.close()
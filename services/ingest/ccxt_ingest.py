@@ -1,12 +1,25 @@
+import asyncio
+import io
 import os
-import time
+import random
 import logging
-from typing import Optional, List
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Deque, Optional, List
 
+import numpy as np
 import pandas as pd
+import pyarrow.parquet as pq
 import ccxt
+import ccxt.async_support as ccxt_async
 from google.cloud import bigquery
 from google.api_core.exceptions import NotFound, Forbidden
+from bq_ohlcv import (  # same folder: the ohlcv write path shared with the backfills
+    BQ_SCHEMA, CLUSTERING_FIELDS, PRESERVE_FP64, TIME_PARTITIONING, USE_STORAGE_WRITE, VALUE_DTYPE,
+    StorageWriter, ohlcv_arrow_table,
+)
 
 
 # ================= Logging =================
@@ -34,6 +47,12 @@ BACKFILL_DAYS = int(os.environ.get("ALPHAGINI_BACKFILL_DAYS", "30"))
 PAGE_LIMIT = int(os.environ.get("ALPHAGINI_INCREMENTAL_LIMIT", "720"))  # Kraken ≈ 720 max per call
 MAX_PAGES = int(os.environ.get("ALPHAGINI_MAX_PAGES", "0"))  # 0 = unlimited
 EXTRA_SLEEP_MS = int(os.environ.get("ALPHAGINI_SLEEP_MS", "0"))
+MAX_RETRIES = 6  # consecutive NetworkErrors per pair before it is abandoned
+FLUSH_MB = int(os.environ.get("ALPHAGINI_FLUSH_MB", "50"))  # buffered page bytes per load job
+ROW_BYTES = 6 * 8  # one candle as float64 [ms, o, h, l, c, v]; sizes the flush buffer
+CONCURRENCY = int(os.environ.get("ALPHAGINI_CONCURRENCY", "4"))  # symbol/timeframe pairs in flight
+LOAD_QUEUE = max(int(os.environ.get("ALPHAGINI_LOAD_QUEUE", "4")), 1)  # queued flushes per pair before fetch waits
+WRITE_CHUNK_ROWS = 50_000  # Storage Write rows per AppendRows request, still well under the 10 MB cap
 
 # Start-point overrides
 FORCE_FROM = os.environ.get("ALPHAGINI_FORCE_FROM", "").strip()          # e.g. "2015-01-01T00:00:00Z"
@@ -48,7 +67,7 @@ def _ms(dt) -> int:
         ts = ts.tz_localize("UTC")
     else:
         ts = ts.tz_convert("UTC")
-    return int(ts.value / 1e6)
+    return ts.value // 1_000_000  # integer ns -> ms, no float rounding
 
 
 def ensure_table(bq: bigquery.Client):
@@ -65,30 +84,17 @@ def ensure_table(bq: bigquery.Client):
         bq.get_table(TABLE_ID)
     except NotFound:
         log.info(f"Creating table {TABLE_ID}")
-        schema = [
-            bigquery.SchemaField("exchange", "STRING"),
-            bigquery.SchemaField("symbol", "STRING"),
-            bigquery.SchemaField("timeframe", "STRING"),
-            bigquery.SchemaField("ts", "TIMESTAMP"),
-            bigquery.SchemaField("open", "FLOAT"),
-            bigquery.SchemaField("high", "FLOAT"),
-            bigquery.SchemaField("low", "FLOAT"),
-            bigquery.SchemaField("close", "FLOAT"),
-            bigquery.SchemaField("volume", "FLOAT"),
-        ]
-        table = bigquery.Table(TABLE_ID, schema=schema)
-        table.time_partitioning = bigquery.TimePartitioning(
-            type_=bigquery.TimePartitioningType.DAY, field="ts"
-        )
+        table = bigquery.Table(TABLE_ID, schema=BQ_SCHEMA)
+        table.time_partitioning = TIME_PARTITIONING
+        table.clustering_fields = CLUSTERING_FIELDS
         bq.create_table(table)
 
-    # Row count snapshot
+    # Row count snapshot from table metadata (no query job, no bytes scanned)
     try:
-        q = f"SELECT COUNT(*) AS rows FROM `{TABLE_ID}`"
-        rows = list(bq.query(q).result())[0].rows
+        rows = bq.get_table(TABLE_ID).num_rows
         log.info(f"BigQuery table ready: {TABLE_ID} | existing_rows={rows}")
     except Exception as e:
-        log.warning(f"Could not query row count for {TABLE_ID}: {e}")
+        log.warning(f"Could not read row count for {TABLE_ID}: {e}")
 
 
 def check_permissions(bq: bigquery.Client):
@@ -103,25 +109,32 @@ def check_permissions(bq: bigquery.Client):
 
 
 def last_ts_in_bq(client: bigquery.Client, symbol: str, timeframe: str):
+    job_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter("ex", "STRING", EXCHANGE_ID),
+            bigquery.ScalarQueryParameter("s", "STRING", symbol),
+            bigquery.ScalarQueryParameter("tf", "STRING", timeframe),
+        ]
+    )
+    # fast path: incremental runs resume from a recent bar, so prune to the last 60 days of partitions
+    recent = f"""
+    SELECT MAX(ts) AS ts FROM `{TABLE_ID}`
+    WHERE ts >= TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL 60 DAY)
+      AND exchange=@ex AND symbol=@s AND timeframe=@tf
+    """
+    row = list(client.query(recent, job_config=job_config).result())[0]
+    if row.ts is not None:
+        return row.ts
+
     q = f"""
     SELECT MAX(ts) AS ts FROM `{TABLE_ID}`
     WHERE exchange=@ex AND symbol=@s AND timeframe=@tf
     """
-    job = client.query(
-        q,
-        job_config=bigquery.QueryJobConfig(
-            query_parameters=[
-                bigquery.ScalarQueryParameter("ex", "STRING", EXCHANGE_ID),
-                bigquery.ScalarQueryParameter("s", "STRING", symbol),
-                bigquery.ScalarQueryParameter("tf", "STRING", timeframe),
-            ]
-        ),
-    )
-    row = list(job.result())[0]
+    row = list(client.query(q, job_config=job_config).result())[0]
     return row.ts  # None if empty
 
 
-def choose_start_ms(last_ts_in_table, timeframe: str) -> int:
+def choose_start_ms(last_ts_in_table, bar_ms: int) -> int:
     """
     Decide since_ms for paging, honoring overrides.
       1) ALPHAGINI_FORCE_FROM (always wins)
@@ -132,8 +145,6 @@ def choose_start_ms(last_ts_in_table, timeframe: str) -> int:
     if FORCE_FROM:
         return _ms(pd.Timestamp(FORCE_FROM))
 
-    bar_ms = ccxt.Exchange.parse_timeframe(timeframe) * 1000
-
     if last_ts_in_table is not None:
         return _ms(last_ts_in_table) + bar_ms
 
@@ -144,27 +155,122 @@ def choose_start_ms(last_ts_in_table, timeframe: str) -> int:
     return _ms(start)
 
 
-def get_exchange() -> ccxt.Exchange:
-    cls = getattr(ccxt, EXCHANGE_ID)
-    ex = cls({"enableRateLimit": True, "options": {"adjustForTimeDifference": True}})
-    ex.load_markets()
+@lru_cache(maxsize=1)
+def exchange() -> ccxt_async.Exchange:
+    # one client per process: markets, time offset and the HTTP session are reused by every pair;
+    # async ccxt throttles all coroutines sharing this instance against ex.rateLimit
+    cls = getattr(ccxt_async, EXCHANGE_ID)
+    return cls({"enableRateLimit": True, "options": {"adjustForTimeDifference": True}})
+
+
+async def get_exchange() -> ccxt_async.Exchange:
+    ex = exchange()
+    if not ex.markets:
+        await ex.load_markets()
     return ex
 
 
-def load_page_to_bq(bq: bigquery.Client, df: pd.DataFrame, symbol: str, timeframe: str) -> int:
-    if df.empty:
+def pages_to_frame(pages: List[list], symbol: str, timeframe: str) -> pd.DataFrame:
+    """Copy raw ccxt pages into one preallocated float64 array, then build typed columns from its slices."""
+    n = sum(len(b) for b in pages)
+    arr = np.empty((n, 6), dtype=np.float64)  # [ms, open, high, low, close, volume]
+    i = 0
+    for b in pages:  # page by page: never materializes a flat list of every candle
+        arr[i:i + len(b)] = b  # None volume -> NaN
+        i += len(b)
+    vals = arr[:, 1:].astype(VALUE_DTYPE, copy=False)
+    return pd.DataFrame({
+        "exchange": np.full(n, EXCHANGE_ID, dtype=object),
+        "symbol": np.full(n, symbol, dtype=object),
+        "timeframe": np.full(n, timeframe, dtype=object),
+        "ts": pd.to_datetime(arr[:, 0].astype(np.int64), unit="ms", utc=True),
+        "open": vals[:, 0], "high": vals[:, 1], "low": vals[:, 2],
+        "close": vals[:, 3], "volume": vals[:, 4],
+    })
+
+
+def load_pages_to_bq(bq: bigquery.Client, pages: List[list], symbol: str, timeframe: str) -> int:
+    """Write buffered pages (one symbol/timeframe) as one Parquet file and append it with a single load job."""
+    if not pages:
         return 0
-    df = df.drop_duplicates(subset=["exchange", "symbol", "timeframe", "ts"]).sort_values("ts")
-    df = df[df["open"].notna() & df["close"].notna()]
-    job = bq.load_table_from_dataframe(df, TABLE_ID)
-    job.result()
-    return len(df)
+    full = pages_to_frame(pages, symbol, timeframe)
+    # ccxt pages are ascending and unique per request; only page seams can repeat a candle
+    full = full.drop_duplicates(subset=["ts"], keep="last")
+    if not full["ts"].is_monotonic_increasing:
+        # not expected from ccxt; MERGE bounds use the first/last rows, so restore order rather than fail
+        log.warning(f"{symbol} {timeframe}: pagination returned out-of-order candles; sorting")
+        full = full.sort_values("ts", kind="mergesort", ignore_index=True)
+    full = full[full["open"].notna() & full["close"].notna()]
+    if full.empty:
+        return 0
+    if USE_STORAGE_WRITE:
+        return storage_writer().append(full)
+    table = ohlcv_arrow_table(full)  # same Parquet layout as the backfills' uploads
+    buf = io.BytesIO()
+    pq.write_table(table, buf, compression="snappy")
+    buf.seek(0)
+    return merge_parquet_to_bq(bq, buf, full["ts"].iloc[0], full["ts"].iloc[-1], symbol, timeframe)
+
+
+def merge_parquet_to_bq(bq: bigquery.Client, buf: io.BytesIO, lo, hi, symbol: str, timeframe: str) -> int:
+    """Load into a throwaway stage table, then MERGE only candles not already in ohlcv."""
+    stage_id = f"{TABLE_ID}_stage_{uuid.uuid4().hex}"
+    stage = bigquery.Table(stage_id, schema=bq.get_table(TABLE_ID).schema)
+    stage.expires = pd.Timestamp.now(tz="UTC") + pd.Timedelta(hours=1)  # safety net if the drop below fails
+    bq.create_table(stage)
+    try:
+        bq.load_table_from_file(
+            buf,
+            stage_id,
+            job_config=bigquery.LoadJobConfig(
+                source_format=bigquery.SourceFormat.PARQUET,
+                write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
+            ),
+        ).result()
+        # constant key + ts bounds on T prune the target to the partitions/cluster this batch touches
+        q = f"""
+        MERGE `{TABLE_ID}` T
+        USING `{stage_id}` S
+        ON T.exchange = S.exchange AND T.symbol = S.symbol AND T.timeframe = S.timeframe AND T.ts = S.ts
+           AND T.exchange = @ex AND T.symbol = @s AND T.timeframe = @tf AND T.ts BETWEEN @lo AND @hi
+        WHEN NOT MATCHED THEN INSERT ROW
+        """
+        job = bq.query(
+            q,
+            job_config=bigquery.QueryJobConfig(
+                query_parameters=[
+                    bigquery.ScalarQueryParameter("ex", "STRING", EXCHANGE_ID),
+                    bigquery.ScalarQueryParameter("s", "STRING", symbol),
+                    bigquery.ScalarQueryParameter("tf", "STRING", timeframe),
+                    bigquery.ScalarQueryParameter("lo", "TIMESTAMP", lo.to_pydatetime()),
+                    bigquery.ScalarQueryParameter("hi", "TIMESTAMP", hi.to_pydatetime()),
+                ]
+            ),
+        )
+        job.result()
+        return int(job.num_dml_affected_rows or 0)
+    finally:
+        bq.delete_table(stage_id, not_found_ok=True)
+
+
+# ================= Storage Write API =================
+@lru_cache(maxsize=1)
+def storage_writer() -> StorageWriter:
+    # one connection shared by every pair for the whole run
+    return StorageWriter(TABLE_ID, WRITE_CHUNK_ROWS)
+
+
+@lru_cache(maxsize=1)
+def load_pool() -> ThreadPoolExecutor:
+    # a single loader serializes MERGE DML on ohlcv while the event loop keeps fetching
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="bq-load")
 
 
 # ================= Main fetch/load =================
-def fetch_and_load_symbol_tf(bq: bigquery.Client, ex: ccxt.Exchange, symbol: str, timeframe: str):
-    last = last_ts_in_bq(bq, symbol, timeframe)
-    since_ms = choose_start_ms(last, timeframe)
+async def fetch_and_load_symbol_tf(bq: bigquery.Client, ex: ccxt_async.Exchange, symbol: str, timeframe: str):
+    bar_ms = ex.parse_timeframe(timeframe) * 1000  # parsed once per pair, reused by every page
+    last = await asyncio.to_thread(last_ts_in_bq, bq, symbol, timeframe)
+    since_ms = choose_start_ms(last, bar_ms)
 
     # log start mode
     if FORCE_FROM:
@@ -180,7 +286,12 @@ def fetch_and_load_symbol_tf(bq: bigquery.Client, ex: ccxt.Exchange, symbol: str
 
     pages = 0
     total_rows = 0
-    bar_ms = ex.parse_timeframe(timeframe) * 1000
+    failures = 0
+    buffered: List[list] = []  # raw ccxt pages; flattened into one array at flush
+    buffered_bytes = 0
+    flush_bytes = FLUSH_MB * 1024 * 1024
+    pending: Deque[asyncio.Future] = deque()
+    loop = asyncio.get_running_loop()
 
     while True:
         if MAX_PAGES and pages >= MAX_PAGES:
@@ -188,69 +299,105 @@ def fetch_and_load_symbol_tf(bq: bigquery.Client, ex: ccxt.Exchange, symbol: str
             break
 
         try:
-            batch = ex.fetch_ohlcv(symbol, timeframe=timeframe, since=since_ms, limit=PAGE_LIMIT)
+            batch = await ex.fetch_ohlcv(symbol, timeframe=timeframe, since=since_ms, limit=PAGE_LIMIT)
         except ccxt.NetworkError as e:
-            log.warning(f"{symbol} {timeframe} | network error: {e}; retrying after 2s")
-            time.sleep(2)
+            failures += 1
+            if failures > MAX_RETRIES:
+                log.error(f"{symbol} {timeframe} | network error: {e}; giving up after {MAX_RETRIES} retries.")
+                break
+            delay = min(60.0, 2.0 * 2 ** (failures - 1)) * random.uniform(0.5, 1.5)
+            log.warning(f"{symbol} {timeframe} | network error: {e}; retry {failures}/{MAX_RETRIES} in {delay:.1f}s")
+            await asyncio.sleep(delay)
             continue
         except ccxt.ExchangeError as e:
             log.error(f"{symbol} {timeframe} | exchange error: {e}; aborting this pair.")
             break
 
+        failures = 0  # reset the backoff on any successful page
+
         if not batch:
             log.info(f"{symbol} {timeframe} | no more data. Done.")
             break
 
         pages += 1
-        df = pd.DataFrame(batch, columns=["ms", "open", "high", "low", "close", "volume"])
-        df["ts"] = pd.to_datetime(df["ms"], unit="ms", utc=True)
-        df["exchange"], df["symbol"], df["timeframe"] = EXCHANGE_ID, symbol, timeframe
-        df = df[["exchange", "symbol", "timeframe", "ts", "open", "high", "low", "close", "volume"]]
-
-        first_ts = df["ts"].iloc[0]
-        last_ts = df["ts"].iloc[-1]
-        loaded = load_page_to_bq(bq, df, symbol, timeframe)
-        total_rows += loaded
+        first_ms, last_ms = int(batch[0][0]), int(batch[-1][0])
+        first_ts = pd.Timestamp(first_ms, unit="ms", tz="UTC")
+        last_ts = pd.Timestamp(last_ms, unit="ms", tz="UTC")
+        buffered.append(batch)
+        buffered_bytes += len(batch) * ROW_BYTES
 
         log.info(
-            f"{symbol} {timeframe} | page={pages} fetched={len(batch)} loaded={loaded} "
+            f"{symbol} {timeframe} | page={pages} fetched={len(batch)} "
             f"range=[{first_ts} .. {last_ts}] total_loaded={total_rows}"
         )
 
+        if buffered_bytes >= flush_bytes:
+            # hand the flush to the load thread and keep fetching; a full queue is the backpressure
+            if len(pending) >= LOAD_QUEUE:
+                total_rows += await pending.popleft()
+            pending.append(loop.run_in_executor(load_pool(), load_pages_to_bq, bq, buffered, symbol, timeframe))
+            log.info(f"{symbol} {timeframe} | queued flush of {buffered_bytes} bytes; total_loaded={total_rows}")
+            buffered, buffered_bytes = [], 0
+
         # advance window by one bar after last row
-        since_ms = int(last_ts.timestamp() * 1000) + bar_ms
+        since_ms = last_ms + bar_ms
 
-        # rate limit + optional extra sleep
-        time.sleep(max(ex.rateLimit / 1000.0, 0.001) + (EXTRA_SLEEP_MS / 1000.0))
+        # enableRateLimit's throttler only waits when calls come faster than ex.rateLimit;
+        # a fixed sleep here would idle even after a slow round trip already used the budget
+        if EXTRA_SLEEP_MS:
+            await asyncio.sleep(EXTRA_SLEEP_MS / 1000.0)
 
         # stop if we've effectively caught up to current time (one bar lag)
-        now_ms = int(pd.Timestamp.now(tz="UTC").timestamp() * 1000)
+        now_ms = ex.milliseconds()
         if since_ms >= now_ms - bar_ms:
             log.info(f"{symbol} {timeframe} | reached current time; stopping.")
             break
 
+    pending.append(loop.run_in_executor(load_pool(), load_pages_to_bq, bq, buffered, symbol, timeframe))
+    while pending:
+        total_rows += await pending.popleft()
     log.info(f"{symbol} {timeframe} | completed pages={pages}, rows_loaded={total_rows}")
 
 
+async def run_async(bq: bigquery.Client):
+    ex = await get_exchange()
+    sem = asyncio.Semaphore(max(CONCURRENCY, 1))
+
+    async def one(sym: str, tf: str):
+        async with sem:
+            await fetch_and_load_symbol_tf(bq, ex, sym, tf)
+
+    try:
+        tasks = []
+        for sym in SYMBOLS:
+            if sym not in ex.markets:
+                log.warning(f"{sym} not listed on {EXCHANGE_ID}; skipping.")
+                continue
+            tasks.extend(one(sym, tf) for tf in TIMEFRAMES)
+        await asyncio.gather(*tasks)
+    finally:
+        await ex.close()
+
+
 def run():
     log.info(
         f"Starting ingest → {TABLE_ID} | exchange={EXCHANGE_ID} | "
         f"symbols={SYMBOLS} | timeframes={TIMEFRAMES} | "
-        f"page_limit={PAGE_LIMIT} max_pages={MAX_PAGES} extra_sleep_ms={EXTRA_SLEEP_MS}"
+        f"page_limit={PAGE_LIMIT} max_pages={MAX_PAGES} extra_sleep_ms={EXTRA_SLEEP_MS} "
+        f"concurrency={CONCURRENCY} storage_write={USE_STORAGE_WRITE} fp64={PRESERVE_FP64}"
     )
 
     bq = bigquery.Client()
     ensure_table(bq)
     check_permissions(bq)
 
-    ex = get_exchange()
-
-    for sym in SYMBOLS:
-        if sym not in ex.markets:
-            log.warning(f"{sym} not listed on {EXCHANGE_ID}; skipping.")
-            continue
-        for tf in TIMEFRAMES:
-            fetch_and_load_symbol_tf(bq, ex, sym, tf)
+    try:
+        asyncio.run(run_async(bq))
+    finally:
+        if load_pool.cache_info().currsize:
+            load_pool().shutdown(wait=True)
+        if USE_STORAGE_WRITE and storage_writer.cache_info().currsize:
+            storage_writer().close()
 
     log.info("Ingest complete.")
 
@@ -16,23 +16,32 @@ SYMBOL_MAP = {
     "SOL/USDT": "SOL-USD"
 }
 
-def find_earliest_data(ticker: str, symbol: str):
-    """Find the earliest available data for a given ticker"""
+def download_all(tickers):
+    """One batched Yahoo request for every ticker (yfinance threads them internally)"""
+    return yf.download(
+        tickers, start="2010-01-01", end="2025-12-31", interval="1d",
+        group_by="ticker", threads=True, progress=False,
+    )
+
+def find_earliest_data(data: pd.DataFrame, ticker: str, symbol: str):
+    """Find the earliest available data for a given ticker in the batched download"""
     print(f"\n🔍 Checking {symbol} ({ticker})...")
     
     try:
-        # Try to get maximum historical data
-        data = yf.download(ticker, start="2010-01-01", end="2025-12-31", interval="1d")
+        # Failed tickers come back as all-NaN columns (or are missing entirely)
+        if ticker not in data.columns.get_level_values(0):
+            print(f"❌ {ticker} - No data available")
+            return None, None, 0
+        data = data[ticker].dropna(how="all")
         
         if data.empty:
             print(f"❌ {ticker} - No data available")
             return None, None, 0
         
-        # Get date range
-        data = data.reset_index()
-        earliest_date = data['Date'].min()
-        latest_date = data['Date'].max()
-        total_rows = len(data)
+        # Get date range straight from the DatetimeIndex (no reset_index copy)
+        earliest_date = data.index.min()
+        latest_date = data.index.max()
+        total_rows = len(data.index)
         
         print(f"✅ {ticker} - Data available")
         print(f"   📅 Earliest: {earliest_date.date()}")
@@ -57,9 +66,10 @@ def calculate_optimal_start_dates():
     print("=" * 60)
     
     results = {}
+    data = download_all(list(SYMBOL_MAP.values()))
     
     for symbol, yahoo_ticker in SYMBOL_MAP.items():
-        earliest, latest, rows = find_earliest_data(yahoo_ticker, symbol)
+        earliest, latest, rows = find_earliest_data(data, yahoo_ticker, symbol)
         
         if earliest:
             results[symbol] = {
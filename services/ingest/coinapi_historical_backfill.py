@@ -8,17 +8,27 @@ Free tier: $25 credits (~5,000 API calls)
 """
 
 import os
-import requests
+from functools import lru_cache
+import asyncio
+import aiohttp
+import numpy as np
 import pandas as pd
 from google.cloud import bigquery
 from datetime import datetime, timedelta
-import time
+
+from bq_ohlcv import df_to_parquet_upload  # same folder
+from fast_json import json_loads  # same folder
 
 # Configuration
 PROJECT = os.environ.get("ALPHAGINI_PROJECT", "alpha-gini")
 DATASET = os.environ.get("ALPHAGINI_BQ_DATASET", "alphagini_marketdata") 
 TABLE_ID = f"{PROJECT}.{DATASET}.ohlcv"
 
+@lru_cache(maxsize=1)
+def _bq() -> bigquery.Client:
+    """Shared BigQuery client for every symbol's load"""
+    return bigquery.Client(project=PROJECT)
+
 # CoinAPI Configuration
 COINAPI_KEY = os.environ.get("COINAPI_KEY")  # Set this environment variable
 COINAPI_BASE = "https://rest.coinapi.io/v1"
@@ -39,63 +49,100 @@ SYMBOL_START_DATES = {
 
 END_DATE = "2025-09-22"  # Stop before recent data for Phase 2
 
-def fetch_coinapi_ohlcv(symbol_id: str, start_date: str, end_date: str) -> pd.DataFrame:
-    """Fetch 5-minute OHLCV data from CoinAPI"""
-    print(f"📥 Fetching {symbol_id} from {start_date} to {end_date}...")
-    
-    if not COINAPI_KEY:
-        raise ValueError("COINAPI_KEY environment variable not set")
-    
-    headers = {"X-CoinAPI-Key": COINAPI_KEY}
-    
+# Pagination: CoinAPI caps one response at 100k rows (~347 days of 5-minute bars)
+PAGE_LIMIT = 100000
+WINDOW_DAYS = PAGE_LIMIT // 288
+MAX_IN_FLIGHT = 8  # concurrent window requests, well under CoinAPI's 100 req/s
+
+# Flat record layout for CoinAPI OHLCV JSON: one allocation, no per-column rename copies
+OHLCV_DTYPE = np.dtype([("ts", "datetime64[us]"), ("open", "f8"), ("high", "f8"),
+                        ("low", "f8"), ("close", "f8"), ("volume", "f8")])
+
+def coinapi_records(data: list) -> pd.DataFrame:
+    """Project CoinAPI OHLCV records straight into the ts/open/high/low/close/volume frame"""
+    arr = np.array([
+        (np.datetime64(r["time_period_start"][:19]), r["price_open"], r["price_high"],
+         r["price_low"], r["price_close"], r["volume_traded"])
+        for r in data
+    ], dtype=OHLCV_DTYPE)
+    df = pd.DataFrame(arr, copy=False)
+    df["ts"] = df["ts"].dt.tz_localize("UTC")  # time_period_start is always UTC ("...Z")
+    return df
+
+def sort_dedupe_ts(df: pd.DataFrame) -> pd.DataFrame:
+    """Stable-sort by ts and keep the first row of each equal-ts run (the rows duplicated(keep='first') keeps)"""
+    df = df.sort_values('ts', kind='mergesort', ignore_index=True)
+    ts = df['ts'].to_numpy()
+    keep = np.empty(len(ts), dtype=bool)
+    keep[:1] = True
+    np.not_equal(ts[1:], ts[:-1], out=keep[1:])  # sorted, so duplicates are adjacent: no hashing
+    return df[keep]
+
+def coinapi_windows(start_date: str, end_date: str) -> list:
+    """Split [start_date, end_date] into back-to-back windows that each fit in one 100k-row response"""
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)  # end_date is inclusive
+    step = timedelta(days=WINDOW_DAYS)
+    windows = []
+    while start < end:
+        windows.append((start, min(start + step, end)))
+        start += step
+    return windows
+
+async def fetch_coinapi_window(session: aiohttp.ClientSession, sem: asyncio.Semaphore,
+                               symbol_id: str, time_start: datetime, time_end: datetime) -> pd.DataFrame:
+    """Fetch one window of 5-minute OHLCV data from CoinAPI (session carries the API key header)"""
     try:
         # CoinAPI OHLCV endpoint for 5-minute data
         url = f"{COINAPI_BASE}/ohlcv/{symbol_id}/USD/history"
         params = {
             "period_id": "5MIN",      # 5-minute intervals
-            "time_start": f"{start_date}T00:00:00",
-            "time_end": f"{end_date}T23:59:59",
-            "limit": 100000          # Max records per request
+            "time_start": time_start.strftime("%Y-%m-%dT%H:%M:%S"),
+            "time_end": time_end.strftime("%Y-%m-%dT%H:%M:%S"),
+            "limit": PAGE_LIMIT      # Max records per request
         }
         
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        
-        data = response.json()
+        async with sem:
+            async with session.get(url, params=params) as response:
+                response.raise_for_status()
+                data = await response.json(loads=json_loads)
         
         if not data:
-            print(f"❌ No data returned for {symbol_id}")
             return pd.DataFrame()
         
-        # Convert to DataFrame
-        df = pd.DataFrame(data)
-        
-        # Rename columns to match our schema
-        df = df.rename(columns={
-            'time_period_start': 'ts',
-            'price_open': 'open',
-            'price_high': 'high', 
-            'price_low': 'low',
-            'price_close': 'close',
-            'volume_traded': 'volume'
-        })
-        
-        # Convert timestamp
-        df['ts'] = pd.to_datetime(df['ts']).dt.tz_convert('UTC')
+        # Parse straight into the ts/open/high/low/close/volume layout
+        return coinapi_records(data)
         
-        # Select required columns
-        df = df[['ts', 'open', 'high', 'low', 'close', 'volume']]
-        
-        print(f"✅ {symbol_id}: {len(df)} 5-minute records ({df['ts'].min()} to {df['ts'].max()})")
-        return df
-        
-    except requests.exceptions.RequestException as e:
-        print(f"❌ API error for {symbol_id}: {e}")
+    except aiohttp.ClientError as e:
+        print(f"❌ API error for {symbol_id} {time_start:%Y-%m-%d}..{time_end:%Y-%m-%d}: {e}")
         return pd.DataFrame()
     except Exception as e:
-        print(f"❌ Error processing {symbol_id}: {e}")
+        print(f"❌ Error processing {symbol_id} {time_start:%Y-%m-%d}..{time_end:%Y-%m-%d}: {e}")
         return pd.DataFrame()
 
+async def fetch_coinapi_ohlcv(session: aiohttp.ClientSession, sem: asyncio.Semaphore,
+                              symbol_id: str, start_date: str, end_date: str) -> pd.DataFrame:
+    """Fetch the full 5-minute range; a single call would stop at 100k rows, so windows go out concurrently"""
+    if not COINAPI_KEY:
+        raise ValueError("COINAPI_KEY environment variable not set")
+    
+    windows = coinapi_windows(start_date, end_date)
+    print(f"📥 Fetching {symbol_id} from {start_date} to {end_date} in {len(windows)} windows...")
+    
+    frames = await asyncio.gather(*[
+        fetch_coinapi_window(session, sem, symbol_id, t0, t1) for t0, t1 in windows
+    ])
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        print(f"❌ No data returned for {symbol_id}")
+        return pd.DataFrame()
+    
+    df = pd.concat(frames, ignore_index=True)
+    df = sort_dedupe_ts(df)
+    
+    print(f"✅ {symbol_id}: {len(df)} 5-minute records ({df['ts'].min()} to {df['ts'].max()})")
+    return df
+
 def load_to_bigquery(df: pd.DataFrame, symbol: str) -> int:
     """Load DataFrame to BigQuery"""
     if df.empty:
@@ -109,13 +156,11 @@ def load_to_bigquery(df: pd.DataFrame, symbol: str) -> int:
     # Reorder columns to match schema
     df = df[['exchange', 'symbol', 'timeframe', 'ts', 'open', 'high', 'low', 'close', 'volume']]
     
-    # Remove duplicates
-    df = df.drop_duplicates(subset=['exchange', 'symbol', 'timeframe', 'ts'])
+    # Remove duplicates: exchange/symbol/timeframe were just set as constants, so ts alone is the key
+    df = sort_dedupe_ts(df)  # already sorted when it comes from fetch_coinapi_ohlcv, so this is a linear pass
     
     try:
-        client = bigquery.Client()
-        job = client.load_table_from_dataframe(df, TABLE_ID)
-        job.result()  # Wait for completion
+        df_to_parquet_upload(df, _bq(), TABLE_ID)  # explicit ohlcv schema, snappy Parquet
         
         print(f"📤 Loaded {len(df)} records for {symbol} to BigQuery")
         return len(df)
@@ -137,8 +182,8 @@ def estimate_api_calls():
         # 5-minute intervals: 288 per day
         total_intervals = days * 288
         
-        # CoinAPI returns up to 100k records per call
-        calls_needed = max(1, total_intervals // 100000 + 1)
+        # One call per WINDOW_DAYS window (each fits in a 100k-record response)
+        calls_needed = len(coinapi_windows(start_date, END_DATE))
         total_calls += calls_needed
         
         print(f"   {symbol}: ~{total_intervals:,} intervals = {calls_needed} API calls")
@@ -148,6 +193,18 @@ def estimate_api_calls():
     
     return total_calls
 
+async def fetch_all() -> list:
+    """Fetch all symbols at once; the network waits overlap instead of running back to back"""
+    async with aiohttp.ClientSession(
+        headers={"X-CoinAPI-Key": COINAPI_KEY},
+        connector=aiohttp.TCPConnector(limit=10),
+    ) as session:
+        sem = asyncio.Semaphore(MAX_IN_FLIGHT)  # shared by every symbol's windows
+        return await asyncio.gather(*[
+            fetch_coinapi_ohlcv(session, sem, coinapi_symbol, SYMBOL_START_DATES[symbol], END_DATE)
+            for symbol, coinapi_symbol in SYMBOL_MAP.items()
+        ])
+
 def main():
     print("🚀 CoinAPI Historical Data Backfill - 5 Minute")
     print("=" * 60)
@@ -175,20 +232,16 @@ def main():
     total_loaded = 0
     
     for symbol, coinapi_symbol in SYMBOL_MAP.items():
-        start_date = SYMBOL_START_DATES[symbol]
-        print(f"\n🔄 Processing {symbol} ({coinapi_symbol})...")
-        print(f"📅 Date range: {start_date} to {END_DATE}")
-        
-        # Fetch historical data
-        df = fetch_coinapi_ohlcv(coinapi_symbol, start_date, END_DATE)
-        
+        print(f"\n🔄 Queued {symbol} ({coinapi_symbol}): {SYMBOL_START_DATES[symbol]} to {END_DATE}")
+    
+    # Fetch every symbol concurrently over one pooled session, then load serially
+    results = asyncio.run(fetch_all())
+    
+    for (symbol, coinapi_symbol), df in zip(SYMBOL_MAP.items(), results):
         if not df.empty:
             # Load to BigQuery
             loaded = load_to_bigquery(df, symbol)
             total_loaded += loaded
-            
-            # Rate limiting (CoinAPI allows 100 requests/sec but be conservative)
-            time.sleep(0.1)
         else:
             print(f"⚠️  Skipping {symbol} - no data available")
     
@@ -1,13 +1,37 @@
 import os
 import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
 import pandas as pd
 from google.cloud import bigquery
+from bq_ohlcv import USE_STORAGE_WRITE, df_to_parquet_upload, storage_write_append  # same folder
+from fast_json import json_loads  # same folder
 from datetime import datetime, timedelta
 
 # CoinGecko API (free tier: 10-50 calls/minute)
 COINGECKO_BASE = "https://api.coingecko.com/api/v3"
 
+@lru_cache(maxsize=1)
+def _bq() -> bigquery.Client:
+    """Process-wide BigQuery client, built on first load (ALPHAGINI_PROJECT is read then, not at import)"""
+    return bigquery.Client(project=os.environ['ALPHAGINI_PROJECT'])
+
+@lru_cache(maxsize=1)
+def http_session() -> requests.Session:
+    """One keep-alive session for every CoinGecko call (skips a TCP/TLS handshake per request)"""
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(
+        pool_maxsize=16,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+    ))
+    return session
+
 # Symbol mapping
 SYMBOL_MAP = {
     "BTC/USDT": "bitcoin",
@@ -16,52 +40,111 @@ SYMBOL_MAP = {
     "SOL/USDT": "solana"
 }
 
+# Shared by every fetch thread: at most RATE_LIMIT calls in any RATE_WINDOW seconds
+RATE_LIMIT = 10
+RATE_WINDOW = 60.0
+rate_limiter = threading.Semaphore(1)
+_call_times = deque(maxlen=RATE_LIMIT)
+
+def _wait_for_rate_limit():
+    """Block until one more call fits in the window (sliding log of the last RATE_LIMIT calls)"""
+    with rate_limiter:
+        if len(_call_times) == RATE_LIMIT:
+            wait = _call_times[0] + RATE_WINDOW - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        _call_times.append(time.monotonic())
+
+# /market_chart/range: the free tier serves at most a year per call, and any range over 90 days
+# comes back at daily granularity (a shorter one would be hourly)
+RANGE_PAGE_DAYS = 365
+DAILY_MIN_SPAN_DAYS = 91
+DAY_MS = 86_400_000
+
+def range_pages(start_date: str, end_date: str) -> list:
+    """(from, to) UNIX-second pages covering [start_date, end_date], each long enough to stay daily"""
+    start = pd.Timestamp(start_date, tz="UTC")
+    hi = pd.Timestamp(end_date, tz="UTC")
+    pages = []
+    while hi > start:
+        lo = max(start, hi - pd.Timedelta(days=RANGE_PAGE_DAYS))
+        # a short first page reaches further back instead; the extra days are trimmed below
+        pages.append((int(min(lo, hi - pd.Timedelta(days=DAILY_MIN_SPAN_DAYS)).timestamp()), int(hi.timestamp())))
+        hi = lo
+    return pages[::-1]
+
 def fetch_historical_daily(coin_id: str, start_date: str, end_date: str):
-    """Fetch daily OHLCV from CoinGecko"""
-    url = f"{COINGECKO_BASE}/coins/{coin_id}/ohlc"
-    params = {
-        "vs_currency": "usd",
-        "days": "max"  # Get maximum history
-    }
+    """
+    Fetch daily bars from CoinGecko, paging /market_chart/range over only [start_date, end_date].
+    /ohlc is not used: it picks candle size from days, and every window over 30 days gives 4-day candles.
+    The daily series has one price per UTC day, so open/high/low/close all equal it.
+    Volume is the day's 24h total_volumes.
+    """
+    url = f"{COINGECKO_BASE}/coins/{coin_id}/market_chart/range"
+    prices, volumes = [], []
+    for lo, hi in range_pages(start_date, end_date):
+        _wait_for_rate_limit()
+        response = http_session().get(url, params={"vs_currency": "usd", "from": lo, "to": hi}, timeout=30)
+        response.raise_for_status()
+        body = json_loads(response.content)
+        # [[ms, value], ...] -> float64 blocks, sliced by column
+        prices.append(np.asarray(body["prices"], dtype=np.float64).reshape(-1, 2))
+        volumes.append(np.asarray(body["total_volumes"], dtype=np.float64).reshape(-1, 2))
+    price = np.concatenate(prices) if prices else np.empty((0, 2))
+    volume = np.concatenate(volumes) if volumes else np.empty((0, 2))
     
-    response = requests.get(url, params=params)
-    response.raise_for_status()
+    # Trim to [start_date, end_date] on the raw epoch-ms column (a short first page reaches back further)
+    start_ms = pd.Timestamp(start_date, tz="UTC").value // 1_000_000
+    end_ms = pd.Timestamp(end_date, tz="UTC").value // 1_000_000
+    price = price[(price[:, 0] >= start_ms) & (price[:, 0] <= end_ms)]
     
-    data = response.json()
-    df = pd.DataFrame(data, columns=["timestamp", "open", "high", "low", "close"])
-    df["ts"] = pd.to_datetime(df["timestamp"], unit="ms", utc=True)
-    df["volume"] = 0  # CoinGecko free tier doesn't include volume
+    # One bar per UTC day; page boundaries can repeat a point, which the groupby absorbs
+    bars = pd.Series(price[:, 1]).groupby(price[:, 0].astype("int64") // DAY_MS, sort=True).agg(
+        ["first", "max", "min", "last"])
+    vol = pd.Series(volume[:, 1]).groupby(volume[:, 0].astype("int64") // DAY_MS).last()
     
-    # Filter date range
-    df = df[(df["ts"] >= start_date) & (df["ts"] <= end_date)]
-    return df[["ts", "open", "high", "low", "close", "volume"]]
+    return pd.DataFrame({
+        "ts": pd.to_datetime(bars.index.to_numpy() * DAY_MS, unit="ms", utc=True),
+        "open": bars["first"].to_numpy(),
+        "high": bars["max"].to_numpy(),
+        "low": bars["min"].to_numpy(),
+        "close": bars["last"].to_numpy(),
+        "volume": vol.reindex(bars.index).to_numpy(),
+    })
 
-def backfill_historical_data():
-    """Backfill historical daily data from CoinGecko"""
-    bq = bigquery.Client()
+def fetch_one(symbol: str, coin_id: str) -> pd.DataFrame:
+    """Fetch and format one coin; runs on a worker thread"""
+    print(f"Fetching {symbol} ({coin_id})...")
     
-    for symbol, coin_id in SYMBOL_MAP.items():
-        print(f"Fetching {symbol} ({coin_id})...")
+    try:
+        df = fetch_historical_daily(coin_id, "2015-01-01", "2025-09-22")
+        
+        # Format for BigQuery
+        df["exchange"] = "coingecko"
+        df["symbol"] = symbol
+        df["timeframe"] = "1d"
+        print(f"Fetched {len(df)} daily records for {symbol}")
+        return df[["exchange", "symbol", "timeframe", "ts", "open", "high", "low", "close", "volume"]]
         
-        try:
-            df = fetch_historical_daily(coin_id, "2015-01-01", "2025-09-22")
-            
-            # Format for BigQuery
-            df["exchange"] = "coingecko"
-            df["symbol"] = symbol
-            df["timeframe"] = "1d"
-            df = df[["exchange", "symbol", "timeframe", "ts", "open", "high", "low", "close", "volume"]]
-            
-            # Load to BigQuery
-            table_id = f"{os.environ['ALPHAGINI_PROJECT']}.{os.environ.get('ALPHAGINI_BQ_DATASET', 'alphagini_marketdata')}.ohlcv"
-            job = bq.load_table_from_dataframe(df, table_id)
-            job.result()
-            
-            print(f"Loaded {len(df)} daily records for {symbol}")
-            time.sleep(6)  # Rate limit: 10 calls/minute
-            
-        except Exception as e:
-            print(f"Error fetching {symbol}: {e}")
+    except Exception as e:
+        print(f"Error fetching {symbol}: {e}")
+        return pd.DataFrame()
+
+def backfill_historical_data():
+    """Backfill historical daily data from CoinGecko, all coins concurrently under the shared rate limit"""
+    with ThreadPoolExecutor(max_workers=len(SYMBOL_MAP)) as executor:
+        frames = [df for df in executor.map(lambda item: fetch_one(*item), SYMBOL_MAP.items()) if not df.empty]
+    if not frames:
+        return
+    
+    # One load job for every coin instead of one per symbol
+    df = pd.concat(frames, ignore_index=True, copy=False)
+    table_id = f"{os.environ['ALPHAGINI_PROJECT']}.{os.environ.get('ALPHAGINI_BQ_DATASET', 'alphagini_marketdata')}.ohlcv"
+    if USE_STORAGE_WRITE:
+        storage_write_append(df, table_id)
+    else:
+        df_to_parquet_upload(df, _bq(), table_id)
+    print(f"Loaded {len(df)} daily records for {len(frames)} symbols")
 
 if __name__ == "__main__":
     ...
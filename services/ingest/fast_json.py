@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+"""
+json_loads for the ingest scripts: orjson when it is installed, the stdlib parser otherwise.
+"""
+
+try:
+    from orjson import loads as json_loads  # optional: 2-3x faster than the stdlib parser
+except ImportError:
+    from json import loads as json_loads
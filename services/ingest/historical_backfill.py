@@ -7,17 +7,25 @@ Run this ONCE to populate historical data, then use ccxt_ingest.py for ongoing u
 """
 
 import os
+import time
+import hashlib
+import tempfile
+from functools import lru_cache
 import pandas as pd
 import yfinance as yf
 from google.cloud import bigquery
+from bq_ohlcv import USE_STORAGE_WRITE, df_to_parquet_upload, storage_write_append  # same folder
 from datetime import datetime, timedelta
-import time
 
 # Configuration
 PROJECT = os.environ.get("ALPHAGINI_PROJECT", "alpha-gini")
 DATASET = os.environ.get("ALPHAGINI_BQ_DATASET", "alphagini_marketdata") 
 TABLE_ID = f"{PROJECT}.{DATASET}.ohlcv"
 
+@lru_cache(maxsize=1)
+def _bq() -> bigquery.Client:
+    return bigquery.Client(project=PROJECT)
+
 # Symbol mapping: Your symbols -> Yahoo Finance tickers
 SYMBOL_MAP = {
     "BTC/USDT": "BTC-USD",
@@ -30,13 +38,37 @@ SYMBOL_MAP = {
 START_DATE = "2015-01-01"
 END_DATE = "2025-09-22"  # Stop before recent data to avoid overlap with ongoing updates
 
-def fetch_yahoo_historical(ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
-    """Fetch historical daily OHLCV from Yahoo Finance"""
-    print(f"📥 Fetching {ticker} from {start_date} to {end_date}...")
-    
+# A rerun within 24h replays the batched download from disk. Cached at the frame level:
+# current yfinance only accepts its own curl_cffi session, not a requests_cache one
+YF_CACHE_DIR = os.path.join(tempfile.gettempdir(), "yf_cache")
+YF_CACHE_TTL = 86400
+
+def download_all(tickers: list, start_date: str, end_date: str) -> pd.DataFrame:
+    """One batched Yahoo request for every ticker (yfinance threads them internally)"""
+    key = hashlib.md5(f"download_all|{' '.join(tickers)}|{start_date}|{end_date}".encode()).hexdigest()
+    path = os.path.join(YF_CACHE_DIR, f"{key}.parquet")
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < YF_CACHE_TTL:
+        print(f"📥 Using cached download of {', '.join(tickers)} ({path})")
+        return pd.read_parquet(path)
+    print(f"📥 Fetching {', '.join(tickers)} from {start_date} to {end_date}...")
+    df = yf.download(
+        " ".join(tickers), start=start_date, end=end_date, interval="1d",
+        group_by="ticker", threads=True, progress=False, auto_adjust=False,
+    )
+    if not df.empty:  # failed downloads are retried next run
+        os.makedirs(YF_CACHE_DIR, exist_ok=True)
+        df.to_parquet(f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+    return df
+
+def fetch_yahoo_historical(batch: pd.DataFrame, ticker: str) -> pd.DataFrame:
+    """Pull one ticker's daily OHLCV out of the batched Yahoo download"""
     try:
-        # Download data
-        data = yf.download(ticker, start=start_date, end=end_date, interval="1d")
+        # Failed tickers come back as all-NaN columns (or are missing entirely)
+        if ticker not in batch.columns.get_level_values(0):
+            print(f"❌ No data returned for {ticker}")
+            return pd.DataFrame()
+        data = batch[ticker].dropna(how="all")
         
         if data.empty:
             print(f"❌ No data returned for {ticker}")
@@ -68,32 +100,35 @@ def fetch_yahoo_historical(ticker: str, start_date: str, end_date: str) -> pd.Da
         print(f"❌ Error fetching {ticker}: {e}")
         return pd.DataFrame()
 
-def load_to_bigquery(df: pd.DataFrame, symbol: str) -> int:
-    """Load DataFrame to BigQuery"""
-    if df.empty:
-        return 0
-    
+def tag_symbol(df: pd.DataFrame, symbol: str) -> pd.DataFrame:
+    """Add the metadata columns and schema order for one symbol's frame"""
     # Add metadata columns
     df['exchange'] = 'yahoo_finance'
     df['symbol'] = symbol  # Use original symbol (BTC/USDT)
     df['timeframe'] = '1d'
     
-    # Reorder columns to match schema
-    df = df[['exchange', 'symbol', 'timeframe', 'ts', 'open', 'high', 'low', 'close', 'volume']]
+    # Remove any duplicate timestamps: the other key columns are constant here, so ts alone decides
+    df = df.loc[~df['ts'].duplicated(keep='first')]
     
-    # Remove any duplicate timestamps
-    df = df.drop_duplicates(subset=['exchange', 'symbol', 'timeframe', 'ts'])
+    # Reorder columns to match schema
+    return df[['exchange', 'symbol', 'timeframe', 'ts', 'open', 'high', 'low', 'close', 'volume']]
+
+def load_to_bigquery(df: pd.DataFrame) -> int:
+    """Load every symbol's rows to BigQuery in a single load job"""
+    if df.empty:
+        return 0
     
     try:
-        client = bigquery.Client()
-        job = client.load_table_from_dataframe(df, TABLE_ID)
-        job.result()  # Wait for completion
+        if USE_STORAGE_WRITE:
+            storage_write_append(df, TABLE_ID)
+        else:
+            df_to_parquet_upload(df, _bq(), TABLE_ID)
         
-        print(f"📤 Loaded {len(df)} records for {symbol} to BigQuery")
+        print(f"📤 Loaded {len(df)} records for {df['symbol'].nunique()} symbols to BigQuery")
         return len(df)
         
     except Exception as e:
-        print(f"❌ BigQuery load error for {symbol}: {e}")
+        print(f"❌ BigQuery load error: {e}")
         return 0
 
 def validate_expected_rows():
@@ -119,24 +154,24 @@ def main():
     
     validate_expected_rows()
     
-    total_loaded = 0
+    frames = []
+    
+    # Fetch every ticker in one batched download (no per-symbol round-trips or sleeps)
+    batch = download_all(list(SYMBOL_MAP.values()), START_DATE, END_DATE)
     
     for symbol, yahoo_ticker in SYMBOL_MAP.items():
         print(f"\n🔄 Processing {symbol} ({yahoo_ticker})...")
         
-        # Fetch historical data
-        df = fetch_yahoo_historical(yahoo_ticker, START_DATE, END_DATE)
+        df = fetch_yahoo_historical(batch, yahoo_ticker)
         
         if not df.empty:
-            # Load to BigQuery
-            loaded = load_to_bigquery(df, symbol)
-            total_loaded += loaded
-            
-            # Rate limiting (be nice to Yahoo)
-            time.sleep(1)
+            frames.append(tag_symbol(df, symbol))
         else:
             print(f"⚠️  Skipping {symbol} - no data available")
     
+    # One load job for all symbols (each job counts against the per-table daily quota)
+    total_loaded = load_to_bigquery(pd.concat(frames, ignore_index=True, copy=False)) if frames else 0
+    
     print(f"\n✅ Historical Backfill Complete!")
     print(f"📤 Total rows loaded: {total_loaded:,}")
     print(f"\n🔄 Next step: Use ccxt_ingest.py for ongoing updates")
@@ -18,9 +18,15 @@ echo "📦 Installing required packages..."
 # Install required packages for testing
 pip install \
     pandas \
+    pyarrow \
     ccxt \
     yfinance \
     requests \
+    aiohttp \
+    isal \
+    diskcache \
+    requests-cache \
+    orjson \
     google-cloud-bigquery \
     db-dtypes
 
@@ -4,9 +4,20 @@ Local test script to validate CCXT exchanges for 2015+ historical data
 Run this before gcloud builds to avoid unnecessary cloud costs
 """
 
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 import ccxt
 import pandas as pd
 from datetime import datetime
+try:
+    import requests_cache  # optional: replay repeated runs from a local SQLite cache for 24h
+    requests_cache.install_cache('alphagini_http', backend='sqlite', expire_after=86400)
+except ImportError:
+    pass
 
 # Test symbols
 SYMBOLS = ["BTC/USD", "ETH/USD"]
@@ -25,65 +36,85 @@ EXCHANGES_TO_TEST = [
     "kraken",            # Kraken (for comparison)
 ]
 
-def test_exchange_2015_data(exchange_id: str):
-    """Test if exchange can provide data from 2015-01-01"""
-    print(f"\n🔍 Testing {exchange_id} for 2015+ historical data...")
+# Market lists survive between runs for a day (ccxt itself only caches them per instance)
+MARKETS_CACHE_DIR = os.path.join(tempfile.gettempdir(), "ccxt_markets")
+MARKETS_TTL = 86400
+
+@lru_cache(maxsize=None)
+def load_exchange(exchange_id: str):
+    """Create the exchange and load its markets once; every symbol probe reuses it"""
+    exchange = getattr(ccxt, exchange_id)({'enableRateLimit': True})
+    path = os.path.join(MARKETS_CACHE_DIR, f"{exchange_id}.json")
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < MARKETS_TTL:
+        with open(path) as fh:
+            exchange.set_markets(json.load(fh))
+    else:
+        exchange.load_markets()
+        os.makedirs(MARKETS_CACHE_DIR, exist_ok=True)
+        with open(path, "w") as fh:
+            json.dump(exchange.markets, fh, default=str)
+    return exchange
+
+def probe_one(exchange_id: str, symbol: str):
+    """Probe one symbol; returns (ok, message) so output can be printed grouped by exchange"""
+    exchange = load_exchange(exchange_id)
+    if symbol not in exchange.markets:
+        return False, f"   ❌ {symbol} - Not available on {exchange_id}"
     
     try:
-        # Check if exchange exists
-        if not hasattr(ccxt, exchange_id):
-            print(f"❌ {exchange_id} - Exchange not found in CCXT")
-            return False, []
-        
-        # Create exchange instance
-        exchange_class = getattr(ccxt, exchange_id)
-        exchange = exchange_class({'enableRateLimit': True})
+        # Try to fetch data from the target date
+        data_2015 = exchange.fetch_ohlcv(
+            symbol, 
+            '5m', 
+            since=TARGET_MS_2015, 
+            limit=10  # Get first 10 days of 2015
+        )
         
-        # Load markets
-        exchange.load_markets()
-        print(f"✅ {exchange_id} - Exchange loaded successfully")
-        
-        symbols_with_2015_data = []
-        
-        # Test 2015 data availability for each symbol
-        for symbol in SYMBOLS:
-            if symbol not in exchange.markets:
-                print(f"   ❌ {symbol} - Not available on {exchange_id}")
-                continue
-                
+        if data_2015 and len(data_2015) > 0:
+            first_date = pd.to_datetime(data_2015[0][0], unit='ms')
+            last_date = pd.to_datetime(data_2015[-1][0], unit='ms')
+            
+            # Check if data starts in 2025
+            if first_date.year == 2025:
+                return True, f"   ✅ {symbol} - 2025 data available! ({first_date.date()} to {last_date.date()})"
+            return False, f"   ⚠️  {symbol} - Data starts from {first_date.date()} (not 2025)"
+        return False, f"   ❌ {symbol} - No data from 2025"
+            
+    except Exception as e:
+        return False, f"   ❌ {symbol} - Error: {str(e)[:80]}..."
+
+def test_all_exchanges(max_workers: int = 12) -> dict:
+    """Probe every (exchange, symbol) pair concurrently; returns {exchange_id: [symbols with data]}"""
+    # Check if exchange exists
+    exchange_ids = []
+    for exchange_id in EXCHANGES_TO_TEST:
+        if hasattr(ccxt, exchange_id):
+            exchange_ids.append(exchange_id)
+        else:
+            print(f"❌ {exchange_id} - Exchange not found in CCXT")
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Load markets first (one task per exchange) so symbol probes never race to load the same one
+        loaded = {ex: executor.submit(load_exchange, ex) for ex in exchange_ids}
+        usable = []
+        for exchange_id, fut in loaded.items():
             try:
-                print(f"   🔍 Testing {symbol} for 2015 data...")
-                
-                # Try to fetch data from 2015-01-01
-                data_2015 = exchange.fetch_ohlcv(
-                    symbol, 
-                    '5m', 
-                    since=TARGET_MS_2015, 
-                    limit=10  # Get first 10 days of 2015
-                )
-                
-                if data_2015 and len(data_2015) > 0:
-                    first_date = pd.to_datetime(data_2015[0][0], unit='ms')
-                    last_date = pd.to_datetime(data_2015[-1][0], unit='ms')
-                    
-                    # Check if data starts in 2025
-                    if first_date.year == 2025:
-                        print(f"   ✅ {symbol} - 2025 data available! ({first_date.date()} to {last_date.date()})")
-                        symbols_with_2015_data.append(symbol)
-                    else:
-                        print(f"   ⚠️  {symbol} - Data starts from {first_date.date()} (not 2025)")
-                else:
-                    print(f"   ❌ {symbol} - No data from 2025")
-                    
+                fut.result()
+                usable.append(exchange_id)
             except Exception as e:
-                print(f"   ❌ {symbol} - Error: {str(e)[:80]}...")
-        
-        success = len(symbols_with_2015_data) > 0
-        return success, symbols_with_2015_data
+                print(f"❌ {exchange_id} - Failed to initialize: {str(e)[:80]}...")
         
-    except Exception as e:
-        print(f"❌ {exchange_id} - Failed to initialize: {str(e)[:80]}...")
-        return False, []
+        tasks = {(ex, sym): executor.submit(probe_one, ex, sym) for ex in usable for sym in SYMBOLS}
+        results = {ex: [] for ex in usable}
+        for exchange_id in usable:
+            print(f"\n🔍 Testing {exchange_id} for 2015+ historical data...")
+            print(f"✅ {exchange_id} - Exchange loaded successfully")
+            for symbol in SYMBOLS:
+                ok, message = tasks[(exchange_id, symbol)].result()
+                print(message)
+                if ok:
+                    results[exchange_id].append(symbol)
+    return results
 
 def main():
     print("🚀 CCXT Exchange Validation Test for 2015+ Historical Data")
@@ -93,10 +124,8 @@ def main():
     
     best_exchanges = []
     
-    for exchange_id in EXCHANGES_TO_TEST:
-        success, symbols_with_data = test_exchange_2015_data(exchange_id)
-        
-        if success:
+    for exchange_id, symbols_with_data in test_all_exchanges().items():
+        if symbols_with_data:
             best_exchanges.append({
                 'exchange': exchange_id,
                 'symbols_count': len(symbols_with_data),
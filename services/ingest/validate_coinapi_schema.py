@@ -5,15 +5,41 @@ Ensures data from CoinAPI matches BigQuery schema and CCXT format
 """
 
 import os
+import asyncio
+from functools import lru_cache
+import aiohttp
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
+try:
+    import requests_cache  # optional: repeated validation runs replay from disk; ETag/Cache-Control honoured
+    requests_cache.install_cache('alphagini_http', backend='sqlite', expire_after=86400, cache_control=True)
+except ImportError:
+    pass
 import ccxt
 from datetime import datetime, timedelta
 
+from coinapi_historical_backfill import coinapi_records  # same folder: the backfill's own parser
+from fast_json import json_loads  # same folder
+
 # Configuration
 COINAPI_KEY = os.environ.get("COINAPI_KEY")
 COINAPI_BASE = "https://rest.coinapi.io/v1"
 
+@lru_cache(maxsize=1)
+def http_session() -> requests.Session:
+    """One keep-alive session for every CoinAPI call (skips a TCP/TLS handshake per request)"""
+    session = requests.Session()
+    if COINAPI_KEY:
+        session.headers["X-CoinAPI-Key"] = COINAPI_KEY
+    session.mount("https://", HTTPAdapter(
+        pool_maxsize=16,
+        max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+    ))
+    return session
+
 # Test symbols
 TEST_SYMBOLS = {
     "BTC/USDT": "BTC",
@@ -21,6 +47,19 @@ TEST_SYMBOLS = {
     "XRP/USDT": "XRP"
 }
 
+MAX_IN_FLIGHT = 20  # concurrent CoinAPI GETs, inside the per-second request budget
+
+async def fetch_coinapi_json(urls: list, param_sets: list) -> list:
+    """GET every param set concurrently on one pooled aiohttp session; failures come back as exceptions"""
+    sem = asyncio.Semaphore(MAX_IN_FLIGHT)
+    async with aiohttp.ClientSession(headers={"X-CoinAPI-Key": COINAPI_KEY}) as session:
+        async def one(u, params):
+            async with sem:
+                async with session.get(u, params=params) as response:
+                    response.raise_for_status()
+                    return await response.json(loads=json_loads)
+        return await asyncio.gather(*[one(u, p) for u, p in zip(urls, param_sets)], return_exceptions=True)
+
 # Expected BigQuery schema
 EXPECTED_BQ_SCHEMA = {
     'exchange': 'STRING',
@@ -43,28 +82,24 @@ def test_coinapi_sample_data():
         print("❌ COINAPI_KEY environment variable not set!")
         return False
     
-    headers = {"X-CoinAPI-Key": COINAPI_KEY}
+    # Test recent 5-minute data (last 24 hours), every symbol in flight at once
+    yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+    today = datetime.now().strftime("%Y-%m-%d")
+    params = {
+        "period_id": "5MIN",
+        "time_start": f"{yesterday}T00:00:00",
+        "time_end": f"{today}T23:59:59",
+        "limit": 10  # Small sample
+    }
+    urls = [f"{COINAPI_BASE}/ohlcv/{coinapi_id}/USD/history" for coinapi_id in TEST_SYMBOLS.values()]
+    responses = asyncio.run(fetch_coinapi_json(urls, [params] * len(urls)))
     
-    for symbol, coinapi_id in TEST_SYMBOLS.items():
+    for (symbol, coinapi_id), data in zip(TEST_SYMBOLS.items(), responses):
         print(f"\n📊 Testing {symbol} ({coinapi_id})...")
         
         try:
-            # Test recent 5-minute data (last 24 hours)
-            yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-            today = datetime.now().strftime("%Y-%m-%d")
-            
-            url = f"{COINAPI_BASE}/ohlcv/{coinapi_id}/USD/history"
-            params = {
-                "period_id": "5MIN",
-                "time_start": f"{yesterday}T00:00:00",
-                "time_end": f"{today}T23:59:59",
-                "limit": 10  # Small sample
-            }
-            
-            response = requests.get(url, headers=headers, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
+            if isinstance(data, Exception):
+                raise data
             
             if not data:
                 print(f"❌ {symbol}: No data returned")
@@ -98,8 +133,6 @@ def test_coinapi_to_bq_schema():
         print("❌ COINAPI_KEY environment variable not set!")
         return False
     
-    headers = {"X-CoinAPI-Key": COINAPI_KEY}
-    
     try:
         # Get sample data for BTC
         yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
@@ -113,37 +146,24 @@ def test_coinapi_to_bq_schema():
             "limit": 5
         }
         
-        response = requests.get(url, headers=headers, params=params)
+        response = http_session().get(url, params=params, timeout=30)
         response.raise_for_status()
-        data = response.json()
+        data = json_loads(response.content)
         
         if not data:
             print("❌ No sample data for schema test")
             return False
         
-        # Convert to DataFrame (simulate coinapi_historical_backfill.py logic)
-        df = pd.DataFrame(data)
-        
         print("📋 Original CoinAPI columns:")
-        print(f"   {list(df.columns)}")
-        
-        # Apply transformations
-        df = df.rename(columns={
-            'time_period_start': 'ts',
-            'price_open': 'open',
-            'price_high': 'high',
-            'price_low': 'low', 
-            'price_close': 'close',
-            'volume_traded': 'volume'
-        })
+        print(f"   {list(data[0].keys())}")
         
-        # Convert timestamp
-        df['ts'] = pd.to_datetime(df['ts']).dt.tz_convert('UTC')
+        # Convert to DataFrame (same projection as coinapi_historical_backfill.py)
+        df = coinapi_records(data)
         
         # Add metadata
-        df['exchange'] = 'coinapi'
-        df['symbol'] = 'BTC/USDT'
-        df['timeframe'] = '5m'
+        df['exchange'] = pd.Categorical(['coinapi'] * len(df))
+        df['symbol'] = pd.Categorical(['BTC/USDT'] * len(df))
+        df['timeframe'] = pd.Categorical(['5m'] * len(df))
         
         # Select final columns
         df = df[['exchange', 'symbol', 'timeframe', 'ts', 'open', 'high', 'low', 'close', 'volume']]
@@ -231,27 +251,23 @@ def estimate_costs():
     print(f"\n💰 Cost Estimation (3 symbols only)")
     print("=" * 40)
     
-    total_calls = 0
-    total_records = 0
-    
     symbols_info = {
         "BTC/USDT": {"start": "2015-01-01", "years": 10},
         "ETH/USDT": {"start": "2017-01-01", "years": 8},
         "XRP/USDT": {"start": "2017-01-01", "years": 8}
     }
     
-    for symbol, info in symbols_info.items():
-        years = info["years"]
-        # 5-minute intervals: 288 per day * 365 days * years
-        intervals = 288 * 365 * years
-        # CoinAPI limit: 100k records per call
-        calls = max(1, intervals // 100000 + 1)
-        
-        total_calls += calls
-        total_records += intervals
-        
-        print(f"   {symbol}: ~{intervals:,} records = {calls} API calls")
+    years = np.array([info["years"] for info in symbols_info.values()])
+    # 5-minute intervals: 288 per day * 365 days * years
+    intervals = 288 * 365 * years
+    # CoinAPI limit: 100k records per call
+    calls = np.maximum(1, intervals // 100_000 + 1)
+    
+    for symbol, n, c in zip(symbols_info, intervals, calls):
+        print(f"   {symbol}: ~{n:,} records = {c} API calls")
     
+    total_calls = int(calls.sum())
+    total_records = int(intervals.sum())
     estimated_cost = total_calls * 0.005  # $5 per 1000 calls
     
     print(f"\n📞 Total API calls: {total_calls}")
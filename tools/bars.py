@@ -1,42 +1,120 @@
 #!/usr/bin/env python3
 import pandas as pd
 import numpy as np
-from typing import Iterable, Literal, Optional
+from typing import Literal, Optional
+try:
+    from numba import njit
+except ImportError:  # numba is optional: searchsorted cuts are used instead
+    njit = None
 
 PriceBasis = Literal["close", "hlc3", "ohlc4", "vwap"]
 
-def _check_cols(df: pd.DataFrame, needed: Iterable[str]) -> None:
-    missing = [c for c in needed if c not in df.columns]
+_REQ_OHLCV = frozenset(("open", "high", "low", "close", "volume"))
+
+def _check_cols(df: pd.DataFrame, needed: frozenset = _REQ_OHLCV) -> None:
+    missing = needed.difference(df.columns)
     if missing:
-        raise ValueError(f"DataFrame missing required columns: {missing}")
+        raise ValueError(f"DataFrame missing required columns: {sorted(missing)}")
 
-def _typical_price(df: pd.DataFrame, basis: PriceBasis) -> pd.Series:
+def _typical_price(df: pd.DataFrame, basis: PriceBasis) -> np.ndarray:
+    """Price per source bar as a float64 array (plain numpy math, no Series alignment)"""
+    col = lambda c: df[c].to_numpy(np.float64, copy=False)
     if basis == "close":
-        return df["close"].astype(float)
+        return col("close")
     if basis == "hlc3":
-        return (df["high"] + df["low"] + df["close"]) / 3.0
+        out = col("high") + col("low")
+        out += col("close")
+        out *= 1.0 / 3.0
+        return out
     if basis == "ohlc4":
-        return (df["open"] + df["high"] + df["low"] + df["close"]) / 4.0
+        out = col("open") + col("high")
+        out += col("low")
+        out += col("close")
+        out *= 0.25
+        return out
     if basis == "vwap":
         if "vwap" not in df.columns:
             raise ValueError("vwap column not present; choose another price_basis")
-        return df["vwap"].astype(float)
+        return col("vwap")
     raise ValueError(f"unsupported basis: {basis}")
 
-def _aggregate_chunk(chunk: pd.DataFrame) -> dict:
-    """Aggregate contiguous time bars into one bar (OHLCV)."""
-    if chunk.empty:
-        return {}
-    return {
-        "open": float(chunk["open"].iloc[0]),
-        "high": float(chunk["high"].max()),
-        "low": float(chunk["low"].min()),
-        "close": float(chunk["close"].iloc[-1]),
-        "volume": float(chunk["volume"].sum()),
-        "n_src_bars": int(len(chunk)),
-        "ts_open": pd.Timestamp(chunk.index[0]),
-        "ts_close": pd.Timestamp(chunk.index[-1]),
-    }
+def _scan_cuts_py(vals: np.ndarray, threshold: float) -> np.ndarray:
+    """Exact reset-to-zero scan: cut where the per-bar running sum reaches threshold."""
+    cuts = np.empty(len(vals), dtype=np.int64)
+    k = 0
+    cum = 0.0
+    for i in range(len(vals)):
+        cum += vals[i]
+        if cum >= threshold:
+            cuts[k] = i
+            k += 1
+            cum = 0.0
+    return cuts[:k]
+
+_scan_cuts = njit(cache=True)(_scan_cuts_py) if njit else None
+
+def _searchsorted_cuts(vals: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Same cuts from one cumsum plus a searchsorted per bar, for when numba is missing.
+    Differences of prefix sums can round differently from the per-bar sum at an exact
+    threshold hit; assumes vals >= 0 (volume, dollar volume, trade counts).
+    """
+    nan_at = np.flatnonzero(np.isnan(vals))
+    if len(nan_at):
+        vals = vals[:nan_at[0]]  # the scan's running sum stays NaN from here on: no further cuts
+    cum = np.cumsum(vals, dtype=np.float64)
+    n = len(cum)
+    cuts = []
+    target = threshold
+    prev = -1
+    while True:
+        idx = int(np.searchsorted(cum, target, side="left"))
+        if idx <= prev:
+            # target didn't move past the last cut (threshold <= 0, or an inf sum): the next row closes a bar
+            idx = prev + 1
+        if idx >= n:
+            break
+        cuts.append(idx)
+        target = cum[idx] + threshold
+        prev = idx
+    return np.asarray(cuts, dtype=np.int64)
+
+def _cut_indices(vals: np.ndarray, threshold: float) -> np.ndarray:
+    """Indices of the source rows that close a bar (njit scan when numba is available)"""
+    vals = np.ascontiguousarray(vals, dtype=np.float64)
+    if _scan_cuts is not None:
+        return _scan_cuts(vals, float(threshold))
+    return _searchsorted_cuts(vals, threshold)
+
+def _segments(n: int, cuts: np.ndarray, keep_tail: bool):
+    """(starts, ends) of each bar as half-open row ranges, including the partial tail bar when asked"""
+    ends = cuts + 1
+    if keep_tail and (ends[-1] if len(ends) else 0) < n:
+        ends = np.append(ends, n)
+    starts = np.concatenate([[0], ends[:-1]])[:len(ends)].astype(np.int64)
+    return starts, ends
+
+def _aggregate(df: pd.DataFrame, starts: np.ndarray, ends: np.ndarray, **extra) -> pd.DataFrame:
+    """
+    Aggregate contiguous time bars into OHLCV bars, all segments at once: open/close
+    are gathers, high/low/volume are reduceat over the full columns. NaNs are skipped
+    like pandas max/min/sum do (fmax/fmin, NaN volume counts as 0).
+    """
+    if not len(starts):
+        return pd.DataFrame()
+    # reduceat runs the last segment to the array end, so cut off a dropped tail first
+    cols = {c: df[c].to_numpy(np.float64)[:ends[-1]] for c in ("open", "high", "low", "close", "volume")}
+    out = pd.DataFrame({
+        "open": cols["open"][starts],
+        "high": np.fmax.reduceat(cols["high"], starts),
+        "low": np.fmin.reduceat(cols["low"], starts),
+        "close": cols["close"][ends - 1],
+        "volume": np.add.reduceat(np.where(np.isnan(cols["volume"]), 0.0, cols["volume"]), starts),
+        "n_src_bars": (ends - starts).astype(np.int64),
+        **extra,
+    }, index=pd.Index(df.index[ends - 1], name="ts_close"),  # bar timestamp = last source bar time
+       copy=False)  # the columns are fresh arrays: adopt them instead of copying into a block
+    return out
 
 def time_to_volume_bars(
     df: pd.DataFrame,
@@ -49,33 +127,12 @@ def time_to_volume_bars(
 
     Input df: indexed by UTC timestamp, columns: open, high, low, close, volume
     """
-    _check_cols(df, ["open", "high", "low", "close", "volume"])
+    _check_cols(df)
     df = df.sort_index()
 
-    bars = []
-    start = 0
-    cum = 0.0
-
-    vols = df["volume"].astype(float).values
-    n = len(df)
-
-    for i in range(n):
-        cum += vols[i]
-        if cum >= vol_threshold:
-            chunk = df.iloc[start : i + 1]
-            bars.append(_aggregate_chunk(chunk))
-            start = i + 1
-            cum = 0.0
-
-    if keep_tail and start < n:
-        chunk = df.iloc[start:n]
-        bars.append(_aggregate_chunk(chunk))
-
-    out = pd.DataFrame(bars)
-    if len(out):
-        out.index = out["ts_close"]  # bar timestamp = last source bar time
-        out = out.drop(columns=["ts_open", "ts_close"])
-    return out
+    vols = df["volume"].to_numpy(np.float64)
+    cuts = _cut_indices(vols, vol_threshold)
+    return _aggregate(df, *_segments(len(df), cuts, keep_tail))
 
 def time_to_dollar_bars(
     df: pd.DataFrame,
@@ -86,33 +143,12 @@ def time_to_dollar_bars(
     """
     Build dollar bars by accumulating (price_basis * volume) across time bars.
     """
-    _check_cols(df, ["open", "high", "low", "close", "volume"])
+    _check_cols(df)
     df = df.sort_index()
-    basis = _typical_price(df, price_basis).astype(float)
-    dv = (basis * df["volume"].astype(float)).values
+    dv = _typical_price(df, price_basis) * df["volume"].to_numpy(np.float64, copy=False)
 
-    bars = []
-    start = 0
-    cum = 0.0
-    n = len(df)
-
-    for i in range(n):
-        cum += dv[i]
-        if cum >= dollar_threshold:
-            chunk = df.iloc[start : i + 1]
-            bars.append(_aggregate_chunk(chunk))
-            start = i + 1
-            cum = 0.0
-
-    if keep_tail and start < n:
-        chunk = df.iloc[start:n]
-        bars.append(_aggregate_chunk(chunk))
-
-    out = pd.DataFrame(bars)
-    if len(out):
-        out.index = out["ts_close"]
-        out = out.drop(columns=["ts_open", "ts_close"])
-    return out
+    cuts = _cut_indices(dv, dollar_threshold)
+    return _aggregate(df, *_segments(len(df), cuts, keep_tail))
 
 def time_to_tick_bars(
     df: pd.DataFrame,
@@ -129,32 +165,11 @@ def time_to_tick_bars(
             f"Column '{trades_col}' not found. True tick bars need a trade count per bar. "
             "Standard OHLCV lacks this; fetch tick/trade data or a 'trades' count."
         )
-    _check_cols(df, ["open", "high", "low", "close", "volume"])
+    _check_cols(df)
     df = df.sort_index()
 
-    ticks = df[trades_col].astype(float).values
-    bars, start, cum = [], 0, 0.0
-    n = len(df)
-
-    for i in range(n):
-        cum += ticks[i]
-        if cum >= ticks_per_bar:
-            chunk = df.iloc[start : i + 1]
-            agg = _aggregate_chunk(chunk)
-            agg["n_ticks"] = float(cum)
-            bars.append(agg)
-            start = i + 1
-            cum = 0.0
-
-    if keep_tail and start < n:
-        chunk = df.iloc[start:n]
-        agg = _aggregate_chunk(chunk)
-        agg["n_ticks"] = float(cum)
-        bars.append(agg)
-
-    out = pd.DataFrame(bars)
-    if len(out):
-        out.index = out["ts_close"]
-        out = out.drop(columns=["ts_open", "ts_close"])
-    return out
-
+    ticks = df[trades_col].to_numpy(np.float64)
+    cuts = _cut_indices(ticks, ticks_per_bar)
+    starts, ends = _segments(len(df), cuts, keep_tail)
+    n_ticks = np.add.reduceat(ticks[:ends[-1]], starts) if len(starts) else np.empty(0)
+    return _aggregate(df, starts, ends, n_ticks=n_ticks)
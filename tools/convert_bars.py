@@ -5,23 +5,21 @@ import pandas as pd
 from typing import Optional
 
 from bars import time_to_volume_bars, time_to_dollar_bars, time_to_tick_bars  # same folder
+from ohlcv_csv import read_ohlcv_csv  # same folder
 
 def load_ohlcv(csv_path: str, symbol: Optional[str], timeframe: Optional[str]) -> pd.DataFrame:
     if not os.path.exists(csv_path):
         raise FileNotFoundError(csv_path)
-    df = pd.read_csv(csv_path)
-    # normalize columns
-    df.columns = [c.lower() for c in df.columns]
+    df = read_ohlcv_csv(csv_path)  # columns normalized to lowercase, ts parsed and sorted
     need = ["ts", "open", "high", "low", "close", "volume"]
     for c in need:
         if c not in df.columns:
             raise ValueError(f"CSV missing required column '{c}'")
-    df["ts"] = pd.to_datetime(df["ts"], utc=True)
     if "symbol" not in df.columns and symbol:
         df["symbol"] = symbol
     if "timeframe" not in df.columns and timeframe:
         df["timeframe"] = timeframe
-    return df.sort_values("ts").set_index("ts")
+    return df.set_index("ts")
 
 def main():
     p = argparse.ArgumentParser(description="Convert time OHLCV into volume/dollar/tick bars.")
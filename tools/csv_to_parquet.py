@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Convert an OHLCV CSV (ccxt/BQ schema) into a hive-partitioned Parquet dataset:
+  <out>/symbol=BTC%2FUSD/timeframe=5m/year=2025/part-0.parquet
+
+tools/local_cli.py reads such a directory (or a single .parquet file) with
+symbol/timeframe/year/ts filters pushed down to the scan, so a backtest only
+touches the partitions and row groups it needs.
+"""
+import argparse
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from ohlcv_csv import read_ohlcv_csv  # same folder
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("symbol", pa.string()), ("timeframe", pa.string()), ("year", pa.int32())]),
+    flavor="hive",
+)  # values are URI-encoded on disk, so "BTC/USD" stays one directory level
+
+def main():
+    p = argparse.ArgumentParser(description="Convert OHLCV CSV into a partitioned Parquet dataset.")
+    p.add_argument("--csv", required=True, help="Input OHLCV CSV")
+    p.add_argument("--out", required=True, help="Output dataset directory")
+    p.add_argument("--symbol", help="Symbol if missing in CSV")
+    p.add_argument("--timeframe", help="Timeframe if missing in CSV")
+    args = p.parse_args()
+
+    df = read_ohlcv_csv(args.csv)
+    for col, value in (("symbol", args.symbol), ("timeframe", args.timeframe)):
+        if col not in df.columns:
+            if not value:
+                raise ValueError(f"CSV has no '{col}' column; pass --{col}")
+            df[col] = value
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.append_column("year", pc.year(table["ts"]).cast(pa.int32()))
+    ds.write_dataset(
+        table, args.out, format="parquet", partitioning=PARTITIONING,
+        existing_data_behavior="delete_matching",  # re-running a conversion replaces its partitions
+    )
+    print(f"Wrote {table.num_rows} rows to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -16,12 +16,17 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 import argparse
 import inspect
+import functools
 import json
 import os
 from typing import Optional, Tuple, Dict
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
 from services.api.app import equity_sma_cross, equity_buy_hold, metrics_from_equity
+from tools.ohlcv_csv import OHLCV_TYPES, read_ohlcv_csv
 
 # -----------------------------
 # Import your existing API code
@@ -57,6 +62,68 @@ train_naive = getattr(api_mod, "train_naive", None)
 # -----------------------------
 # CSV loading / schema helpers
 # -----------------------------
+def _read_csv_cached(csv_path: str) -> pd.DataFrame:
+    """
+    Parse the CSV once, then reuse an uncompressed Feather sidecar (memory-mapped, so
+    repeated sweeps over the same file skip the parse) while the CSV's size and mtime_ns
+    still match the ones recorded in the sidecar's schema metadata.
+    """
+    sidecar = csv_path + ".feather"
+    st = os.stat(csv_path)
+    stamp = f"{st.st_size}:{st.st_mtime_ns}".encode()  # any replacement changes it, even an older mtime
+    if os.path.exists(sidecar):
+        try:
+            table = feather.read_table(sidecar, memory_map=True)
+            if (table.schema.metadata or {}).get(b"alphagini_csv_stat") == stamp:
+                return table.to_pandas(split_blocks=True)
+        except (OSError, pa.ArrowException):
+            pass  # unreadable sidecar: parse the CSV and rewrite it
+    df = read_ohlcv_csv(csv_path)
+    tmp = f"{sidecar}.{os.getpid()}.tmp"
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"alphagini_csv_stat": stamp})
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, sidecar)  # readers never see a half-written sidecar
+    except (OSError, pa.ArrowException):
+        # read-only location or a frame Arrow can't store: the load itself already succeeded
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+    return df
+
+def _read_parquet_dataset(path: str, symbol: Optional[str], timeframe: Optional[str],
+                          start: Optional[str], end: Optional[str]) -> pd.DataFrame:
+    """
+    Parquet file or hive-partitioned directory (see tools/csv_to_parquet.py), with the
+    symbol/timeframe/date predicates pushed down to the scan instead of filtered in pandas.
+    """
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    names = set(dataset.schema.names)
+    preds = []
+    if symbol and "symbol" in names:
+        preds.append(ds.field("symbol") == symbol)
+    if timeframe and "timeframe" in names:
+        preds.append(ds.field("timeframe") == timeframe)
+    if start:
+        t0 = pd.Timestamp(start, tz="UTC")
+        preds.append(ds.field("ts") >= t0)
+        if "year" in names:
+            preds.append(ds.field("year") >= t0.year)  # prunes whole partitions
+    if end:
+        t1 = pd.Timestamp(end, tz="UTC")
+        preds.append(ds.field("ts") < t1)
+        if "year" in names:
+            preds.append(ds.field("year") <= t1.year)
+    filt = None
+    for pred in preds:
+        filt = pred if filt is None else filt & pred
+    columns = [c for c in dataset.schema.names if c.lower() in OHLCV_TYPES or c.lower() in ("symbol", "timeframe")]
+    table = dataset.to_table(columns=columns, filter=filt)
+    table = table.rename_columns([c.lower() for c in table.column_names])
+    if "ts" in table.column_names:
+        table = table.sort_by("ts")
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
 def load_ohlcv_csv(
     csv_path: str,
     symbol: Optional[str],
@@ -74,7 +141,10 @@ def load_ohlcv_csv(
     if not os.path.exists(csv_path):
         raise FileNotFoundError(csv_path)
 
-    df = pd.read_csv(csv_path)
+    if csv_path.endswith(".parquet") or os.path.isdir(csv_path):
+        df = _read_parquet_dataset(csv_path, symbol, timeframe, start, end)  # already filtered at scan time
+    else:
+        df = _read_csv_cached(csv_path)  # ts already parsed to UTC and sorted
     low = {c.lower(): c for c in df.columns}
 
     def need(col):
@@ -82,8 +152,6 @@ def load_ohlcv_csv(
             raise ValueError(f"CSV missing required column '{col}'")
 
     need("ts"); need("open"); need("high"); need("low"); need("close")
-    df.rename(columns={low["ts"]: "ts"}, inplace=True)
-    df["ts"] = pd.to_datetime(df["ts"], utc=True)
 
     if "volume" in low:
         df.rename(columns={low["volume"]: "volume"}, inplace=True)
@@ -113,7 +181,7 @@ def load_ohlcv_csv(
     if df.empty:
         raise ValueError("No rows after filtering (check symbol/timeframe/start/end).")
 
-    df = df.sort_values("ts").set_index("ts")
+    df = df.set_index("ts")  # filters keep the reader's ts order
     return df[["open", "high", "low", "close", "volume"]], df["symbol"].iloc[0], df["timeframe"].iloc[0]
 
 
@@ -121,15 +189,23 @@ def load_ohlcv_csv(
 # Metrics (use your function if present)
 # -----------------------------
 def _basic_metrics(eq: pd.Series, cash_start: float) -> Dict[str, float]:
-    eq = eq.astype(float)
-    rets = eq.pct_change().replace([np.inf, -np.inf], np.nan).fillna(0.0)
-    total = float(eq.iloc[-1] / eq.iloc[0] - 1.0) if len(eq) else 0.0
+    if not len(eq):
+        return {"final_equity": float(cash_start), "abs_return": 0.0, "sharpe": 0.0, "win_rate": float("nan")}
+    a = np.asarray(eq, dtype=np.float64)
+    # simple returns in one numpy pass; first bar and inf/nan (zero equity) count as 0
+    rets = np.empty_like(a)
+    rets[0] = 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(np.diff(a), a[:-1], out=rets[1:])
+        total = float(a[-1] / a[0] - 1.0)
+    np.nan_to_num(rets, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+    std = rets.std()
     sr = float(0.0)
-    if rets.std(ddof=0) > 0:
+    if std > 0:
         # simple annualization using daily scale; your metrics fn may do this more precisely
-        sr = float((rets.mean() / rets.std(ddof=0)) * np.sqrt(365))
+        sr = float((rets.mean() / std) * np.sqrt(365))
     return {
-        "final_equity": float(eq.iloc[-1]) if len(eq) else float(cash_start),
+        "final_equity": float(a[-1]),
         "abs_return": total,
         "sharpe": sr,
         "win_rate": float((rets > 0).mean()),
@@ -146,6 +222,11 @@ def compute_metrics(eq: pd.Series, cash_start: float) -> Dict[str, float]:
 # -----------------------------
 # Backtest runner that calls YOUR functions
 # -----------------------------
+@functools.lru_cache(maxsize=None)
+def _param_names(fn) -> Tuple[str, ...]:
+    """Parameter names of a strategy function, introspected once per function (sweeps call run_backtest a lot)"""
+    return tuple(inspect.signature(fn).parameters)
+
 def run_backtest(
     df: pd.DataFrame,
     symbol: str,
@@ -161,19 +242,18 @@ def run_backtest(
         if not callable(equity_buy_hold):
             raise RuntimeError("equity_buy_hold not found in services/api")
         # Inspect signature to decide whether your function expects (series, cash) or (df, cash, ...)
-        sig = inspect.signature(equity_buy_hold)
-        if len(sig.parameters) == 2:
+        if len(_param_names(equity_buy_hold)) == 2:
             eq = equity_buy_hold(close, cash_start)  # type: ignore[misc]
         else:
             eq = equity_buy_hold(df, cash_start)     # type: ignore[misc]
     elif strategy == "sma_cross":
         if not callable(equity_sma_cross):
             raise RuntimeError("equity_sma_cross not found in services/api")
-        sig = inspect.signature(equity_sma_cross)
+        params = _param_names(equity_sma_cross)
         # Support both (series, cash, fast, slow) and (df, cash, fast, slow)
-        if len(sig.parameters) >= 4:
+        if len(params) >= 4:
             # decide whether first param should be series or df by name
-            first = list(sig.parameters.keys())[0]
+            first = params[0]
             if first in ("price", "close", "series"):
                 eq = equity_sma_cross(close, cash_start, sma_fast, sma_slow)  # type: ignore[misc]
             else:
@@ -186,8 +266,9 @@ def run_backtest(
 
     # Make sure it's a pandas Series aligned to time index
     if not isinstance(eq, pd.Series):
-        eq = pd.Series(eq, index=close.index)  # tolerate list/array returns
-    if not eq.index.equals(close.index):
+        # tolerate list/array returns: they line up positionally, nothing to align or fill
+        eq = pd.Series(np.asarray(eq, dtype=np.float64), index=close.index)
+    elif not eq.index.equals(close.index):
         eq = eq.reindex(close.index).ffill().bfill()
 
     metrics = compute_metrics(eq, cash_start)
@@ -246,7 +327,7 @@ def build_parser() -> argparse.ArgumentParser:
     sub = p.add_subparsers(dest="cmd", required=True)
 
     b = sub.add_parser("backtest", help="Run a strategy backtest using services/api strategies.")
-    b.add_argument("--csv", required=True, help="Path to OHLCV CSV")
+    b.add_argument("--csv", required=True, help="Path to OHLCV CSV, .parquet file or partitioned dataset dir")
     b.add_argument("--symbol", help="Symbol to filter, e.g. BTC/USD")
     b.add_argument("--timeframe", help="Timeframe to filter, e.g. 5m")
     b.add_argument("--start", help="Start ISO8601 (UTC), e.g. 2024-08-01T00:00:00Z")
@@ -257,7 +338,7 @@ def build_parser() -> argparse.ArgumentParser:
     b.add_argument("--sma-slow", dest="sma_slow", type=int, default=30)
 
     t = sub.add_parser("train", help="Train a model using services/api training functions (if present).")
-    t.add_argument("--csv", required=True, help="Path to OHLCV CSV")
+    t.add_argument("--csv", required=True, help="Path to OHLCV CSV, .parquet file or partitioned dataset dir")
     t.add_argument("--symbol", help="Symbol to filter")
     t.add_argument("--timeframe", help="Timeframe to filter")
     t.add_argument("--start", help="Start ISO8601 (UTC)")
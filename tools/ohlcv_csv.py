@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+OHLCV CSV reader shared by convert_bars.py and local_cli.py.
+Importable as tools.ohlcv_csv or, from scripts in this folder, as ohlcv_csv.
+"""
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+# Arrow parses these natively (multithreaded); names are matched case-insensitively below
+OHLCV_TYPES = {"ts": pa.timestamp("ns", tz="UTC"), **{c: pa.float64() for c in ("open", "high", "low", "close", "volume")}}
+
+def read_ohlcv_csv(csv_path: str) -> pd.DataFrame:
+    """pyarrow.csv read with declared column types; returns lowercased columns sorted by ts"""
+    def convert(types):
+        return pacsv.ConvertOptions(column_types={v: t for c, t in types.items() for v in (c, c.upper(), c.capitalize())})
+    # ts with a zone offset, then naive ts (taken as UTC) - both stay in Arrow's parser;
+    # only formats Arrow can't read at all go through pd.to_datetime
+    for ts_type in (OHLCV_TYPES["ts"], pa.timestamp("ns"), None):
+        types = {**OHLCV_TYPES, "ts": ts_type} if ts_type else {c: t for c, t in OHLCV_TYPES.items() if c != "ts"}
+        try:
+            table = pacsv.read_csv(csv_path, convert_options=convert(types))
+            break
+        except pa.ArrowInvalid:
+            if ts_type is None:
+                raise
+    table = table.rename_columns([c.lower() for c in table.column_names])
+    if "ts" not in table.column_names:
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+    if ts_type is None:
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        df["ts"] = pd.to_datetime(df["ts"], utc=True)
+        return df.sort_values("ts", kind="mergesort", ignore_index=True)
+    ts = table["ts"]
+    if ts.type.tz is None:
+        ts = ts.cast(OHLCV_TYPES["ts"])  # naive wall-clock values are UTC
+        table = table.set_column(table.column_names.index("ts"), "ts", ts)
+    return table.sort_by("ts").to_pandas(split_blocks=True, self_destruct=True)
@@ -267,7 +267,7 @@ export default function Page() {
 type BacktestResult = {
   summary?: Record<string, unknown>;
   metrics?: Record<string, unknown>;
-  equity_curve?: { ts: string; equity: number }[];
+  series?: { ts: number[]; equity: number[] }; // ts = epoch ms (UTC)
 };
 
 function ResultSection({ result }: { result: BacktestResult }) {
@@ -303,13 +303,10 @@ function ResultSection({ result }: { result: BacktestResult }) {
     return value.toString();
   }, []);
 
-  const equityCurve = React.useMemo(() => {
-    const points = result.equity_curve ?? [];
-    return {
-      ts: points.map((p) => p.ts),
-      equity: points.map((p) => p.equity),
-    };
-  }, [result.equity_curve]);
+  const equityCurve = React.useMemo(
+    () => ({ ts: result.series?.ts ?? [], equity: result.series?.equity ?? [] }),
+    [result.series],
+  );
 
   const hasMetrics = metricOrder.some((key) => typeof metrics[key] === "number");
 
@@ -4,7 +4,7 @@ import { ResponsiveContainer, AreaChart, Area, XAxis, YAxis, Tooltip } from "rec
 
 type Point = { t: Date; equity: number };
 
-export default function EquityChart({ ts, equity }: { ts: string[]; equity: number[] }) {
+export default function EquityChart({ ts, equity }: { ts: (string | number)[]; equity: number[] }) {
   if (!ts?.length || !equity?.length || ts.length !== equity.length) {
     return (
       <div className="rounded border border-neutral-700 p-4 text-sm text-neutral-400">
@@ -13,7 +13,7 @@ export default function EquityChart({ ts, equity }: { ts: string[]; equity: numb
     );
   }
 
-  const data: Point[] = ts.map((iso, i) => ({ t: new Date(iso), equity: equity[i] }));
+  const data: Point[] = ts.map((t, i) => ({ t: new Date(t), equity: equity[i] }));
 
   return (
     <div className="h-80 w-full">